@@ -1,4 +1,4 @@
-from app import app
+import multiprocessing
 import webbrowser
 from threading import Timer
 
@@ -6,5 +6,11 @@ def open_browser():
     webbrowser.open_new_tab("http://localhost:8050")
 
 if __name__ == '__main__':
+    #postprocess worker processes of frozen (cx_Freeze) builds start from the same executable
+    multiprocessing.freeze_support()
+    #postprocess workers must not fork the multithreaded app
+    multiprocessing.set_start_method('spawn')
+    #app is imported here so that postprocess worker processes don't launch engines when they import this module
+    from app import app
     Timer(2, open_browser).start() #open browser with delay so server has time to start up
     app.run_server(debug=False, threaded=False)
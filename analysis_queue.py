@@ -0,0 +1,280 @@
+import collections
+import itertools
+import multiprocessing
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from position_arrays import PositionArrays
+from position_data import build_shared_position_data
+
+#runs analysis jobs (searches and create_data for a list of positions) in a background worker thread,
+#so that the analyze callbacks return immediately and the UI keeps working on already finished positions
+#jobs run one at a time in submission order, searches of each job still run in parallel in the engine pool
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+CANCELLED = 'cancelled'
+FAILED = 'failed'
+
+PIPELINE_QUEUE_SIZE = 2 #batches waiting between pipeline stages
+
+
+def put_item(q, item, stop):
+    #blocking put that gives up when consumer has stopped
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return(True)
+        except queue.Full:
+            pass
+    return(False)
+
+
+def get_item(q, stop):
+    #blocking get that gives up when stopped, returns None then
+    while not stop.is_set():
+        try:
+            return(q.get(timeout=0.1))
+        except queue.Empty:
+            pass
+    return(None)
+
+
+class AnalysisJob:
+    def __init__(self, job_id, tree_data, positions, analyze_all, budget_ladder=False, on_done=None):
+        #positions: list of (position_id, fen, searches), searches: list of (parameters, board, nodes) per config
+        #budget_ladder: configs of a position that differ only by nodes are searched as one ladder
+        #on_done: called in the worker thread when the job finished without being cancelled or failing
+        self.job_id = job_id
+        self.tree_data = tree_data
+        self.positions = positions
+        self.analyze_all = analyze_all
+        self.budget_ladder = budget_ladder
+        self.on_done = on_done
+        self.status = QUEUED
+        self.error = None
+        self.positions_done = 0
+        self.nodes = 0
+        self.start_time = None
+        self.end_time = None
+        self.reported = None #progress last reported to the UI
+        self.cancel_event = threading.Event()
+
+    def is_finished(self):
+        return(self.status in (DONE, CANCELLED, FAILED))
+
+    def nodes_per_second(self):
+        if self.start_time is None:
+            return(0)
+        elapsed = (self.end_time or time.time()) - self.start_time
+        return(self.nodes / elapsed if elapsed > 0 else 0)
+
+    def get_batches(self, searches_per_batch):
+        #groups positions so that each batch has enough searches to keep the engine pool busy
+        batch = []
+        nr_of_searches = 0
+        for position in self.positions:
+            batch.append(position)
+            nr_of_searches += len(position[2])
+            if nr_of_searches >= searches_per_batch:
+                yield(batch)
+                batch = []
+                nr_of_searches = 0
+        if batch:
+            yield(batch)
+
+
+class AnalysisQueue:
+    def __init__(self, searches_per_batch=1, postprocess_workers=0):
+        #create_data of positions runs in a pool of postprocess_workers processes, in the worker thread if 0
+        self.searches_per_batch = searches_per_batch
+        self.postprocess_workers = postprocess_workers
+        self.process_pool = None
+        self.jobs = {} #{job_id: AnalysisJob}
+        self.pending = queue.Queue()
+        self.job_ids = itertools.count(1)
+        self.lock = threading.Lock()
+        self.worker = None
+
+    def submit(self, tree_data, positions, analyze_all, budget_ladder=False, on_done=None):
+        with self.lock:
+            job = AnalysisJob(next(self.job_ids), tree_data, positions, analyze_all, budget_ladder, on_done)
+            self.jobs[job.job_id] = job
+            self.pending.put(job)
+            if self.worker is None:
+                self.worker = threading.Thread(target=self.work, name='analysis-queue', daemon=True)
+                self.worker.start()
+        return(job)
+
+    def get_job(self, job_id):
+        return(self.jobs.get(job_id))
+
+    def get_queued_count(self):
+        return(sum(job.status == QUEUED for job in list(self.jobs.values())))
+
+    def cancel(self, job_id=None):
+        #cancels given job or all unfinished jobs
+        #queued jobs never start, running job stops after the searches in progress
+        jobs = list(self.jobs.values()) if job_id is None else [self.jobs.get(job_id)]
+        for job in jobs:
+            if job is not None and not job.is_finished():
+                job.cancel_event.set()
+                if job.status == QUEUED:
+                    job.status = CANCELLED
+
+    def get_process_pool(self):
+        if self.process_pool is None and self.postprocess_workers > 0:
+            #workers are spawned, forking the app would copy the locks held by its engine and server threads
+            try:
+                self.process_pool = ProcessPoolExecutor(max_workers=self.postprocess_workers,
+                                                        mp_context=multiprocessing.get_context('spawn'))
+            except TypeError:
+                #python < 3.7, start method is set to spawn in LcT.py
+                self.process_pool = ProcessPoolExecutor(max_workers=self.postprocess_workers)
+        return(self.process_pool)
+
+    def quit(self):
+        self.cancel()
+        if self.process_pool is not None:
+            self.process_pool.shutdown(wait=False)
+
+    def work(self):
+        while True:
+            job = self.pending.get()
+            if job.cancel_event.is_set():
+                job.status = CANCELLED
+                continue
+            try:
+                self.run_job(job)
+            except Exception as e:
+                job.error = str(e)
+                job.status = FAILED
+            finally:
+                job.end_time = time.time()
+
+    def run_job(self, job):
+        #pipeline of three stages connected by bounded queues: search stage runs lc0 searches batch by batch,
+        #parse stage parses their tree dumps and this thread hands the trees to create_data processes,
+        #so parsing and layout of one batch overlap with the lc0 searches of the next
+        #results of create_data are installed in position order as they complete
+        #only configs that are new or changed since the position was analyzed are searched,
+        #positions whose trees didn't change keep their plot data
+        job.status = RUNNING
+        job.start_time = time.time()
+        tree_data = job.tree_data
+        if job.analyze_all: #positions that are not in the job are not part of the game anymore
+            position_ids = set(position[0] for position in job.positions)
+            tree_data.clear_positions([position_id
+                                       for position_id in list(tree_data.G_dict) + list(tree_data.position_data)
+                                       if position_id not in position_ids])
+
+        searched = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+        parsed = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+        stop = threading.Event() #set when this thread stops consuming, e.g. after an error
+        errors = []
+
+        def search_stage():
+            try:
+                for batch in job.get_batches(self.searches_per_batch):
+                    #cancelling stops new searches, searches already done still go through the pipeline
+                    if job.cancel_event.is_set():
+                        break
+                    changed = [tree_data.get_changed_configs(position_id, fen, position_searches, job.budget_ladder)
+                               for position_id, fen, position_searches in batch]
+                    searches = [(position_id,) + position_searches[i]
+                                for (position_id, _, position_searches), indices in zip(batch, changed)
+                                for i in indices]
+                    results = tree_data.start_searches(searches, job.budget_ladder)
+                    if not put_item(searched, (batch, changed, searches, results), stop):
+                        tree_data.discard_searches(results)
+                        return
+            except Exception as e:
+                errors.append(e)
+            finally:
+                put_item(searched, None, stop)
+
+        def parse_stage():
+            try:
+                while True:
+                    item = get_item(searched, stop)
+                    if item is None:
+                        break
+                    batch, changed, searches, results = item
+                    try:
+                        trees = tree_data.parse_searches(results)
+                    except Exception:
+                        tree_data.discard_searches(results)
+                        raise
+                    job.nodes += tree_data.get_searched_nodes(searches, results, trees, job.budget_ladder)
+                    if not put_item(parsed, (batch, changed, trees), stop):
+                        return
+            except Exception as e:
+                errors.append(e)
+            finally:
+                put_item(parsed, None, stop)
+
+        stages = [threading.Thread(target=search_stage, name='analysis-search', daemon=True),
+                  threading.Thread(target=parse_stage, name='analysis-parse', daemon=True)]
+        for stage in stages:
+            stage.start()
+        process_pool = self.get_process_pool()
+        building = collections.deque() #(position_id, future, G_list, analyzed) in position order
+
+        def install_oldest():
+            position_id, future, G_list, analyzed = building.popleft()
+            tree_data.install_position_data(position_id, future.result(), G_list, analyzed)
+            job.positions_done += 1
+
+        try:
+            while True:
+                item = get_item(parsed, stop)
+                if item is None:
+                    break
+                batch, changed, trees = item
+                trees = iter(trees)
+                for (position_id, fen, position_searches), indices in zip(batch, changed):
+                    updated = tree_data.get_updated_trees(position_id, fen, position_searches, indices,
+                                                          [next(trees) for _ in indices], job.budget_ladder)
+                    if updated is None:
+                        job.positions_done += 1
+                        continue
+                    G_list, analyzed = updated
+                    #merged tree and layout of the last build are updated with the changed trees
+                    previous = tree_data.get_previous_build(position_id, indices, G_list)
+                    if process_pool is None:
+                        tree_data.create_data(position_id, fen, G_list, analyzed, previous)
+                        job.positions_done += 1
+                        continue
+                    building.append((position_id, process_pool.submit(build_shared_position_data, G_list, fen,
+                                                                      previous), G_list, analyzed))
+                    #install finished positions right away and limit number of positions in flight
+                    while building and (building[0][1].done() or len(building) > 2 * self.postprocess_workers):
+                        install_oldest()
+            while building:
+                install_oldest()
+        finally:
+            #positions still building when the job failed are not installed and keep their last build,
+            #their shared memory is freed
+            for _, future, _, _ in building:
+                if future.cancel():
+                    continue
+                try:
+                    PositionArrays.discard(future.result().data)
+                except Exception:
+                    pass
+            stop.set()
+            for stage in stages:
+                stage.join()
+            #searches that the parse stage didn't get to when the pipeline stopped early
+            while not searched.empty():
+                item = searched.get()
+                if item is not None:
+                    tree_data.discard_searches(item[3])
+        if errors:
+            raise errors[0]
+        job.status = CANCELLED if job.cancel_event.is_set() else DONE
+        if job.status == DONE and job.on_done is not None:
+            job.on_done()
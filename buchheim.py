@@ -1,4 +1,6 @@
+import collections
 import time
+import numpy as np
 #code from https://llimllib.github.io/pymag-trees/  with slight modifications
 
 class DrawTree(object):
@@ -7,8 +9,8 @@ class DrawTree(object):
         self.y = depth
         self.G = G
         self.node = node
-        C = list(G.successors(node))
-        C.sort(key = lambda x: -int(self.G.nodes[x]['N']))
+        C = list(G.get_children(node))
+        C.sort(key = lambda x: -int(self.G.N[x]))
         self.children = [DrawTree(G, n, self, depth+1, i+1) 
                          for i, n
                          in enumerate(C)]
@@ -161,3 +163,240 @@ def second_walk(v, m=0, depth=0, min=None):
         min = second_walk(w, m + v.mod, depth+1, min)
     #pos[v.node][0] = v.x
     return min
+
+
+#iterative version of the same algorithm for SearchTrees
+#per node state lives in flat lists indexed by slot, where slots are tree rows with each group of siblings
+#sorted by visits like DrawTree sorts children. Siblings are then consecutive slots, so sibling number,
+#left brother and leftmost sibling are plain index arithmetic instead of scans over parent's children
+
+NO_THREAD = np.iinfo(np.int32).max #thread_depth of nodes without thread
+
+#first walk result of buchheim_layout indexed by node, for reusing it when the tree changes
+#thread is a node or -1, thread_depth is the depth of the node whose apportion set the thread and
+#thread_mod the mod of the node before that
+LayoutState = collections.namedtuple('LayoutState', ['x', 'mod', 'thread', 'thread_depth', 'thread_mod'])
+
+
+def get_slots(G):
+    #slot order of nodes and slot of each node
+    order = np.lexsort((-G.N, G.parent))
+    slot_of = np.empty(len(G), dtype=np.int64)
+    slot_of[order] = np.arange(len(G))
+    return(order, slot_of)
+
+
+def get_unchanged_subtrees(G, G_old, new_ids):
+    #mask of nodes of G whose subtree is drawn the same as in G_old (same nodes and same order of siblings)
+    #new_ids: node of G of each node of G_old, -1 if it was removed
+    old_of_new = np.full(len(G), -1, dtype=np.int64)
+    kept = new_ids >= 0
+    old_of_new[new_ids[kept]] = np.flatnonzero(kept)
+    sibling_numbers = []
+    for tree in (G_old, G):
+        order, slot_of = get_slots(tree)
+        sibling_numbers.append(slot_of - np.searchsorted(tree.parent[order], tree.parent))
+    old_sibling_number, sibling_number = sibling_numbers
+    changed = np.zeros(len(G), dtype=bool)
+    added = np.flatnonzero(old_of_new < 0)
+    moved = np.flatnonzero(old_of_new >= 0)
+    moved = moved[sibling_number[moved] != old_sibling_number[old_of_new[moved]]]
+    removed = np.flatnonzero(~kept & (G_old.parent >= 0))
+    #parents of added, moved and removed nodes, root is never added or moved
+    changed[G.parent[added[added > 0]]] = True
+    changed[G.parent[moved[moved > 0]]] = True
+    removed_parents = new_ids[G_old.parent[removed]]
+    changed[removed_parents[removed_parents >= 0]] = True
+    changed[added] = True
+    #subtree changes when anything below it changes
+    for start, end in reversed(list(G.levels())[1:]):
+        level = np.arange(start, end)
+        changed[G.parent[level[changed[start:end]]]] = True
+    return(~changed)
+
+
+def buchheim_layout(G, distance=1., previous=None, with_state=False):
+    #returns x coordinate and depth of each node (indexed by node) like the DrawTree x and y from
+    #buchheim(G, root), and LayoutState if with_state
+    #previous: (G_old, LayoutState of G_old, new_ids) with new_ids as in get_unchanged_subtrees, the first walk
+    #of subtrees that didn't change is then taken from the state instead of walking them again
+    n = len(G)
+    order, slot_of = get_slots(G)
+    parent_slot = np.full(n, -1, dtype=np.int64)
+    parent_slot[1:] = slot_of[G.parent[order[1:]]]
+    first_child = G.child_offsets[order]
+    end_child = G.child_offsets[order + 1]
+    #first slot of the sibling group, i.e. first child of parent
+    first_sibling = np.zeros(n, dtype=np.int64)
+    first_sibling[1:] = first_child[parent_slot[1:]]
+
+    parent_slot = parent_slot.tolist()
+    first_child = first_child.tolist()
+    end_child = end_child.tolist()
+    first_sibling = first_sibling.tolist()
+
+    x = [-1.] * n
+    mod = [0] * n
+    thread = [-1] * n
+    ancestor = list(range(n))
+    change = [0] * n
+    shift = [0] * n
+    depth = G.depth[order].tolist()
+    thread_depth = [NO_THREAD] * n
+    thread_mod = [0] * n
+    next_child = list(first_child)
+    reused = [False] * n #slots whose children's subtrees are taken from previous
+    if previous is not None:
+        x, mod, thread, thread_depth, thread_mod, reused = restore_subtrees(G, order, slot_of, *previous)
+        for v in np.flatnonzero(reused).tolist():
+            next_child[v] = end_child[v]
+        reused = reused.tolist()
+
+    def left(v):
+        if thread[v] >= 0:
+            return(thread[v])
+        return(first_child[v] if first_child[v] < end_child[v] else -1)
+
+    def right(v):
+        if thread[v] >= 0:
+            return(thread[v])
+        return(end_child[v] - 1 if first_child[v] < end_child[v] else -1)
+
+    def move_subtree(wl, wr, amount):
+        subtrees = wr - wl #difference of sibling numbers
+        change[wr] -= amount / subtrees
+        shift[wr] += amount
+        change[wl] += amount / subtrees
+        x[wr] += amount
+        mod[wr] += amount
+
+    def apportion(v, default_ancestor):
+        if v == first_sibling[v]:
+            return(default_ancestor)
+        vir = vor = v
+        vil = v - 1
+        vol = first_sibling[v]
+        sir = sor = mod[v]
+        sil = mod[vil]
+        sol = mod[vol]
+        while right(vil) >= 0 and left(vir) >= 0:
+            vil = right(vil)
+            vir = left(vir)
+            vol = left(vol)
+            vor = right(vor)
+            ancestor[vor] = v
+            amount = (x[vil] + sil) - (x[vir] + sir) + distance
+            if amount > 0:
+                a = ancestor[vil]
+                if parent_slot[a] != parent_slot[v]:
+                    a = default_ancestor
+                move_subtree(a, v, amount)
+                sir = sir + amount
+                sor = sor + amount
+            sil += mod[vil]
+            sir += mod[vir]
+            sol += mod[vol]
+            sor += mod[vor]
+        if right(vil) >= 0 and right(vor) < 0:
+            thread[vor] = right(vil)
+            thread_depth[vor] = depth[v]
+            thread_mod[vor] = mod[vor]
+            mod[vor] += sil - sor
+        else:
+            if left(vir) >= 0 and left(vol) < 0:
+                thread[vol] = left(vir)
+                thread_depth[vol] = depth[v]
+                thread_mod[vol] = mod[vol]
+                mod[vol] += sir - sol
+            default_ancestor = v
+        return(default_ancestor)
+
+    #first walk in post order with an explicit stack, each child is apportioned right after its subtree is done
+    default_ancestors = list(first_child)
+    stack = [0]
+    while stack:
+        v = stack[-1]
+        c = next_child[v]
+        if c < end_child[v]:
+            next_child[v] = c + 1
+            stack.append(c)
+            continue
+        stack.pop()
+        is_first_sibling = v == first_sibling[v]
+        if first_child[v] == end_child[v]:
+            x[v] = 0. if is_first_sibling else x[v - 1] + distance
+        else:
+            #execute shifts, children of reused slots have them already
+            if not reused[v]:
+                total_shift = total_change = 0
+                for w in range(end_child[v] - 1, first_child[v] - 1, -1):
+                    x[w] += total_shift
+                    mod[w] += total_shift
+                    total_change += change[w]
+                    total_shift += shift[w] + total_change
+            midpoint = (x[first_child[v]] + x[end_child[v] - 1]) / 2
+            if not is_first_sibling:
+                x[v] = x[v - 1] + distance
+                mod[v] = x[v] - midpoint
+            else:
+                x[v] = midpoint
+        p = parent_slot[v]
+        if p >= 0:
+            default_ancestors[p] = apportion(v, default_ancestors[p])
+
+    #second walk: add sum of ancestors' mods, one depth at a time
+    x = np.array(x, dtype=np.float64)
+    mod = np.array(mod, dtype=np.float64)
+    if with_state:
+        thread = np.array(thread, dtype=np.int64)
+        state = LayoutState(x[slot_of], mod[slot_of], np.where(thread >= 0, order[thread], -1)[slot_of],
+                            np.array(thread_depth, dtype=np.int32)[slot_of], np.array(thread_mod, dtype=np.float64)[slot_of])
+    parent_slot = np.array(parent_slot)
+    m = np.zeros(n, dtype=np.float64)
+    for start, end in list(G.levels())[1:]:
+        m[start:end] = m[parent_slot[start:end]] + mod[parent_slot[start:end]]
+    x += m
+    #third walk
+    min_x = x.min()
+    if min_x < 0:
+        x += -min_x
+    if with_state:
+        return(x[slot_of], G.depth, state)
+    return(x[slot_of], G.depth)
+
+
+def restore_subtrees(G, order, slot_of, G_old, state, new_ids):
+    #first walk state of buchheim_layout (lists indexed by slot) with nodes of unchanged subtrees set as they were
+    #right after the first walk of the subtree's root, i.e. without threads set by apportions on or above root
+    #returns x, mod, thread, thread_depth, thread_mod and mask of root slots of the reused subtrees
+    n = len(G)
+    unchanged = get_unchanged_subtrees(G, G_old, new_ids)
+    unchanged_parent = np.zeros(n, dtype=bool)
+    unchanged_parent[1:] = unchanged[G.parent[1:]]
+    has_children = G.child_offsets[1:] > G.child_offsets[:-1]
+    roots = unchanged & ~unchanged_parent & has_children
+    inside = unchanged & unchanged_parent
+    root_depth = np.where(roots, G.depth, -1)
+    for start, end in list(G.levels())[1:]:
+        root_depth[start:end] = np.where(inside[start:end], root_depth[G.parent[start:end]], root_depth[start:end])
+
+    nodes = np.flatnonzero(inside)
+    old_of_new = np.full(n, -1, dtype=np.int64)
+    old_of_new[new_ids[new_ids >= 0]] = np.flatnonzero(new_ids >= 0)
+    old_nodes = old_of_new[nodes]
+    undo = state.thread_depth[old_nodes] <= root_depth[nodes]
+    old_thread = np.where(undo, -1, state.thread[old_nodes])
+    slots = slot_of[nodes]
+    x = np.full(n, -1.)
+    x[slots] = state.x[old_nodes]
+    mod = np.zeros(n)
+    mod[slots] = np.where(undo, state.thread_mod[old_nodes], state.mod[old_nodes])
+    thread = np.full(n, -1, dtype=np.int64)
+    thread[slots] = np.where(old_thread >= 0, slot_of[new_ids[np.maximum(old_thread, 0)]], -1)
+    thread_depth = np.full(n, NO_THREAD, dtype=np.int64)
+    thread_depth[slots] = np.where(undo, NO_THREAD, state.thread_depth[old_nodes])
+    thread_mod = np.zeros(n)
+    thread_mod[slots] = np.where(undo, 0., state.thread_mod[old_nodes])
+    reused = np.zeros(n, dtype=bool)
+    reused[slot_of[roots]] = True
+    return(x.tolist(), mod.tolist(), thread.tolist(), thread_depth.tolist(), thread_mod.tolist(), reused)
@@ -7,7 +7,7 @@ import dash_table
 from server import app
 from global_data import config_data
 
-from constants import MAX_NODES, MAX_NUMBER_OF_CONFIGS, DEFAULT_NUMBER_OF_CONFIGS, DEFAULT_NODES
+from constants import MAX_NODES, MAX_NUMBER_OF_CONFIGS, DEFAULT_NUMBER_OF_CONFIGS, DEFAULT_NODES, BUDGET_LADDER
 
 external_stylesheets = ['https://codepen.io/chriddyp/pen/bWLwgP.css']
 
@@ -61,7 +61,13 @@ def settings_bar():
                                                 'value': 'global'}],
                                       value=['global'])
 
-    nodes_selector = html.Div(children=[nodes_mode_select, nodes_input],
+    #configs that differ only by Nodes are searched in one engine that keeps its tree between the budgets
+    ladder_mode_select = dcc.Checklist(id='ladder-mode-selector',
+                                       options=[{'label': 'Budget ladder',
+                                                 'value': 'ladder'}],
+                                       value=['ladder'] if BUDGET_LADDER else [])
+
+    nodes_selector = html.Div(children=[nodes_mode_select, nodes_input, ladder_mode_select],
                               style={'flex': 1})
 
 
@@ -6,6 +6,11 @@ MAX_NUMBER_OF_CONFIGS = 10
 DEFAULT_NUMBER_OF_CONFIGS = 1
 DEFAULT_NODES = 800
 SHOW_UNICODE_BOARD = False
+ENGINE_POOL_SIZE = max(1, min(4, (os.cpu_count() or 1) // 2)) #number of lc0_tree processes searching in parallel
+ENGINE_THREADS = max(1, (os.cpu_count() or 1) // ENGINE_POOL_SIZE) #upper limit for Threads option of each pooled engine
+POSTPROCESS_WORKERS = max(1, min(4, (os.cpu_count() or 1) // 2)) #processes building plot data of analyzed positions, 0 builds them in the app process
+BUDGET_LADDER = False #default of the budget ladder switch, configs of a position that differ only by Nodes are searched in one engine that keeps its tree
+FIGURE_CACHE_MAX_NODES = 1000000 #total number of plotted nodes in cached plot data and tree figures
 
 def root_directory():
     if getattr(sys, 'frozen', False):
@@ -16,4 +21,6 @@ def root_directory():
         root = os.path.dirname(__file__)#os.path.dirname(os.path.abspath(__file__))#os.path.dirname(__file__)
     return(root)
 
-ROOT_DIR = root_directory()
\ No newline at end of file
+ROOT_DIR = root_directory()
+SEARCH_CACHE_DIR = os.path.join(ROOT_DIR, 'search_cache') #deterministic search results are stored here
+SEARCH_CACHE_MAX_MB = 2048
\ No newline at end of file
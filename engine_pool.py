@@ -0,0 +1,75 @@
+import queue
+from concurrent.futures import ThreadPoolExecutor
+
+from leela import leela_engine, load_tree_dump, EngineLaunchError
+
+
+class EnginePool:
+    #pool of lc0_tree processes for running independent searches in parallel
+    #first engine of the pool is the main engine, the rest are launched lazily on first use
+    def __init__(self, main_engine, size, threads):
+        self.main_engine = main_engine
+        self.size = max(1, size)
+        self.threads = threads
+        self.engines = [main_engine]
+        self.idle_engines = queue.Queue()
+        self.idle_engines.put(main_engine)
+        self.launch_error = None #error of the first failed launch, launching is not retried after it
+
+    def launch_engines(self):
+        while len(self.engines) < self.size and self.launch_error is None:
+            try:
+                engine = leela_engine(None)
+            except EngineLaunchError as e:
+                #could not launch more engines, carry on with the ones we have
+                self.launch_error = str(e)
+                break
+            self.engines.append(engine)
+            self.idle_engines.put(engine)
+
+    def limit_threads(self, parameters):
+        #keep total number of search threads of the pool within the cpu budget
+        parameters = dict(parameters)
+        if self.threads is not None and 'Threads' in parameters:
+            parameters['Threads'] = min(int(parameters['Threads']), self.threads)
+        return(parameters)
+
+    def search(self, parameters, board, nodes, parse=True):
+        return(self.search_ladder(parameters, board, [nodes], parse)[0])
+
+    def search_ladder(self, parameters, board, budgets, parse=True):
+        #searches with increasing node limits in one engine that keeps its tree between them
+        engine = self.idle_engines.get()
+        try:
+            engine.configure(self.limit_threads(parameters))
+            tree_files = engine.search_ladder(board, budgets)
+        finally:
+            self.idle_engines.put(engine)
+        if parse:
+            return([load_tree_dump(tree_file) for tree_file in tree_files])
+        return(tree_files)
+
+    def run(self, jobs, parse=True):
+        #jobs: list of (parameters, board, nodes) tuples, each job must have its own board object
+        #returns search trees in the same order as the jobs, or paths of unparsed tree dumps if parse is False
+        ladders = self.run_ladders([(parameters, board, [nodes]) for parameters, board, nodes in jobs], parse)
+        return([trees[0] for trees in ladders])
+
+    def run_ladders(self, ladders, parse=True):
+        #ladders: list of (parameters, board, budgets) tuples, budgets are increasing node limits
+        #returns list of search trees (or tree dump paths) of each budget for each ladder
+        self.launch_engines()
+        if not self.engines:
+            raise EngineLaunchError(f'No engine available. {self.launch_error or ""}')
+        with ThreadPoolExecutor(max_workers=len(self.engines)) as executor:
+            futures = [executor.submit(self.search_ladder, parameters, board, budgets, parse)
+                       for parameters, board, budgets in ladders]
+            trees = [future.result() for future in futures]
+        return(trees)
+
+    def quit(self):
+        for engine in self.engines[1:]:
+            engine.quit()
+        self.engines = [self.main_engine]
+        self.idle_engines = queue.Queue()
+        self.idle_engines.put(self.main_engine)
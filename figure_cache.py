@@ -0,0 +1,47 @@
+import collections
+import threading
+
+#least recently used cache of finished tree figures and the plot data and spatial indexes they are built from,
+#so that going back to already seen positions and configs doesn't rebuild them
+#size of the cache is bounded by the total number of plotted nodes of cached entries
+#each entry remembers the position data it was built from, so entries of reanalyzed positions are never returned
+
+
+class FigureCache:
+    def __init__(self, max_nodes):
+        self.max_nodes = max_nodes
+        self.entries = collections.OrderedDict() #{key: (data, value, nr_of_nodes)}, key starts with (position_mode, position_id)
+        self.nr_of_nodes = 0
+        self.lock = threading.Lock()
+
+    def get(self, key, data):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return(None)
+            if entry[0] is not data:
+                self.remove(key)
+                return(None)
+            self.entries.move_to_end(key)
+            return(entry[1])
+
+    def put(self, key, data, value, nr_of_nodes):
+        if nr_of_nodes > self.max_nodes:
+            return
+        with self.lock:
+            if key in self.entries:
+                self.remove(key)
+            self.entries[key] = (data, value, nr_of_nodes)
+            self.nr_of_nodes += nr_of_nodes
+            while self.nr_of_nodes > self.max_nodes:
+                self.remove(next(iter(self.entries)))
+
+    def remove(self, key):
+        self.nr_of_nodes -= self.entries.pop(key)[2]
+
+    def invalidate(self, position_mode, position_ids=None):
+        #drops entries of given positions, or of all positions of the mode if position_ids is None
+        with self.lock:
+            for key in list(self.entries):
+                if key[0] == position_mode and (position_ids is None or key[1] in position_ids):
+                    self.remove(key)
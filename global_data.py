@@ -1,20 +1,24 @@
-from networkx.algorithms.dag import topological_sort
 import graphtools as gt
-import plottools as pt
 import chess
 import chess.engine
-from leela import leela_engine
+from leela import leela_engine, load_tree_dump
+from engine_pool import EnginePool
+from search_cache import SearchCache
+from analysis_queue import AnalysisQueue
+from figure_cache import FigureCache
+from searchtree import SearchTree
+from position_arrays import PositionArrays
+from position_data import build_position_data, get_layout_state
 import os
 from os.path import isfile, join
 
 from dash_table.Format import Format, Scheme
 
-from constants import MAX_NUMBER_OF_CONFIGS, DEFAULT_NODES, ROOT_DIR, SHOW_UNICODE_BOARD
+from constants import MAX_NUMBER_OF_CONFIGS, DEFAULT_NODES, ROOT_DIR, ENGINE_POOL_SIZE, ENGINE_THREADS, POSTPROCESS_WORKERS, \
+    SEARCH_CACHE_DIR, SEARCH_CACHE_MAX_MB, FIGURE_CACHE_MAX_NODES
 import time
 import json
 
-BEST_MOVE_COLOR = 'rgb(178,34,34)'
-
 # deterministic search settings
 deterministic_defaults = {
     'Threads': 1,
@@ -183,6 +187,10 @@ class GameData:
         return(fen_id)
 
 
+def is_deterministic(parameters):
+    #only searches with deterministic settings give the same tree on every run
+    return(all(str(parameters.get(option)) == str(value) for option, value in deterministic_defaults.items()))
+
 def is_number(s):
     try:
         float(s)
@@ -294,6 +302,9 @@ class ConfigData:
     def is_data_equal_to_analyzed(self):
         return(self.data == self.data_analyzed)
 
+    def set_analyzed(self, data):
+        self.data_analyzed = data
+
     def get_row(self, row_ind):
         row = self.data[row_ind]
         return(row)
@@ -333,50 +344,28 @@ class ConfigData:
         d = [col for col in self.columns if col['id'] not in columns_to_exclude]
         return(d)
 
-#replicate behaviour of numpy's linspace
-def linspace(a, b, n):
-    if n == 0:
-        return([])
-    elif n < 2:
-        return [a]
-    diff = (b - a)/(n - 1)
-    return([diff * i + a  for i in range(n)])
-
 class TreeData:
-    def __init__(self, lc0, type):
+    def __init__(self, lc0, type, engine_pool=None, search_cache=None):
         self.lc0 = lc0
+        self.engine_pool = engine_pool if engine_pool is not None else EnginePool(lc0, 1, None)
+        self.search_cache = search_cache
         self.type = type  # 'pgn' or 'fen'
         self.G_dict = {} #{position_id1: [], position_id2: []....}
-        self.merged_graphs = {} #{position_id: merger_graph...}
-        self.heatmap_data_for_moves = {} #{position_id: [{(color, piece, depth): z}, ... ]}
-        self.heatmap_data_for_board_states = {}  # {position_id: [{(color, piece, depth): z}, ... ]}
-        self.data = {}
-        self.data_depth = {}
+        self.analyzed_configs = {} #{position_id: (fen, [get_config_keys key of each config's tree])}
+        #{position_id: PositionData}, analysis may run in background, a position is replaced with one assignment
+        #so callbacks that take the PositionData of a position once never see a mix of two builds
+        self.position_data = {}
+        self.heatmap_data_for_moves = {} #{position_id: (PositionData, [{(color, piece, depth): z}, ... ])}
+        self.heatmap_data_for_board_states = {}  # {position_id: (PositionData, [{(color, piece, depth): z}, ... ])}
         self.board = chess.Board()
 
-        self.x_range = {}
-        self.y_range = {}
-        self.y_tick_labels = {}
-        self.y_tick_values = {}
-        self.y2_range = {}
-        self.x_tick_labels = {}
-        self.x_tick_values = {}
-
     def reset_data(self):
         self.G_dict = {}
-        self.merged_graphs = {}
+        self.analyzed_configs = {}
+        self.position_data = {}
         self.heatmap_data_for_moves = {}
         self.heatmap_data_for_board_states = {}
-        self.data = {}
-        self.data_depth = {}
         self.board = chess.Board()
-        self.x_range = {}
-        self.y_range = {}
-        self.y_tick_labels = {}
-        self.y_tick_values = {}
-        self.y2_range = {}
-        self.x_tick_labels = {}
-        self.x_tick_values = {}
 
     def get_best_moves(self, position_id, slider_value, type, max_moves):
         try:
@@ -389,16 +378,17 @@ class TreeData:
         metrics = []
         moves = []
         for node in children:
+            attributes = gt.get_attributes(tree, node)
             if type == 'p':
-                metric = float(tree.nodes[node]['P'])
+                metric = float(attributes['P'])
             elif type == 'n':
-                metric = int(tree.nodes[node]['N'])
+                metric = int(attributes['N'])
             elif type == 'q':
-                metric = float(tree.nodes[node]['Q'])
+                metric = float(attributes['Q'])
             elif type in ('ml_low', 'ml_high'):
-                metric = float(tree.nodes[node]['M'])
+                metric = float(attributes['M'])
             metrics.append(metric)
-            moves.append(tree.nodes[node]['move'])
+            moves.append(attributes['move'])
 
         if moves == []:
             return([], [])
@@ -419,154 +409,209 @@ class TreeData:
         moves = moves[: min(max_moves, nr_of_children)]
         return(moves, metrics)
 
-    def run_search(self, position_id, parameters, board, nodes):
-        self.lc0.configure(parameters)
-        g = self.lc0.play(board, nodes)
-        if position_id in self.G_dict:
-            self.G_dict[position_id].append(g)
-        else:
-            self.G_dict[position_id] = [g]
+    def get_cache_key(self, parameters, board, nodes, previous_budgets=()):
+        if self.search_cache is None or not is_deterministic(parameters):
+            return(None)
+        options = self.lc0.normalize_options(dict(parameters))
+        return(self.search_cache.get_key(board, options, nodes, self.lc0.net_path, self.lc0.engine_path,
+                                         previous_budgets))
+
+    def get_ladders(self, jobs, budget_ladder):
+        #groups jobs into budget ladders, lists of job indices by increasing nodes
+        #jobs of the same position with the same parameters form one ladder if budget_ladder is set,
+        #each rung needs more nodes than the one before, jobs with nodes equal to a lower rung are searched alone
+        groups = {}
+        for i, (position_id, parameters, _, _) in enumerate(jobs):
+            key = (position_id, tuple(sorted(parameters.items()))) if budget_ladder else i
+            groups.setdefault(key, []).append(i)
+        ladders = []
+        for group in groups.values():
+            ladder = []
+            for i in sorted(group, key=lambda i: int(jobs[i][3])):
+                if ladder and int(jobs[i][3]) == int(jobs[ladder[-1]][3]):
+                    ladders.append([i])
+                else:
+                    ladder.append(i)
+            ladders.append(ladder)
+        return(ladders)
+
+    def get_config_keys(self, searches, budget_ladder):
+        #(parameters, nodes, previous budgets) of each config of a position, searches: list of
+        #(parameters, board, nodes) per config, previous budgets are the nodes of lower rungs of the config's ladder
+        #returns keys and ladders of config indices
+        ladders = self.get_ladders([(None,) + search for search in searches], budget_ladder)
+        keys = [None] * len(searches)
+        for ladder in ladders:
+            for rung, i in enumerate(ladder):
+                parameters, _, nodes = searches[i]
+                keys[i] = (parameters, nodes, tuple(searches[j][2] for j in ladder[:rung]))
+        return(keys, ladders)
+
+    def run_searches(self, jobs, budget_ladder=False):
+        #jobs: list of (position_id, parameters, board, nodes) in config order
+        #deterministic searches that have been run before are loaded from the search cache,
+        #the rest run in parallel in the engine pool
+        #trees are stored in job order so that G_dict[position_id][i] is the tree of i:th config
+        trees = self.parse_searches(self.start_searches(jobs, budget_ladder))
+        self.add_trees(jobs, trees)
+        return(trees)
+
+    #run_searches split into stages, so that analysis queue can run them in a pipeline
+
+    def start_searches(self, jobs, budget_ladder=False):
+        #runs the searches that are not cached, returns (cache key, cached tree or path of tree dump) per job
+        #with budget_ladder, jobs that differ only by nodes run as one budget ladder, one search that continues
+        #with the tree of the previous budget and dumps a tree at each budget, see get_ladders
+        ladders = self.get_ladders(jobs, budget_ladder)
+        keys = [None] * len(jobs)
+        for ladder in ladders:
+            for rung, i in enumerate(ladder):
+                _, parameters, board, nodes = jobs[i]
+                keys[i] = self.get_cache_key(parameters, board, nodes, [jobs[j][3] for j in ladder[:rung]])
+        results = [None if key is None else self.search_cache.load(key) for key in keys]
+        #ladder is searched again as a whole when any of its trees is missing
+        missing = [ladder for ladder in ladders if any(results[i] is None for i in ladder)]
+        tree_files = self.engine_pool.run_ladders([jobs[ladder[0]][1:3] + ([jobs[i][3] for i in ladder],)
+                                                   for ladder in missing], parse=False)
+        for ladder, ladder_files in zip(missing, tree_files):
+            for i, tree_file in zip(ladder, ladder_files):
+                if isinstance(results[i], SearchTree):
+                    os.remove(tree_file)
+                else:
+                    results[i] = tree_file
+        return(list(zip(keys, results)))
+
+    def parse_searches(self, results):
+        #parses tree dumps returned by start_searches and stores them in search cache
+        trees = []
+        for key, result in results:
+            if isinstance(result, SearchTree):
+                trees.append(result)
+                continue
+            tree = load_tree_dump(result)
+            if key is not None:
+                self.search_cache.store(key, tree)
+            trees.append(tree)
+        return(trees)
+
+    def get_searched_nodes(self, jobs, results, trees, budget_ladder=False):
+        #number of nodes searched by lc0 for start_searches results and their parsed trees, cached trees don't count
+        #a budget ladder is one search that continues from rung to rung, its nodes are those of its last tree
+        nodes = 0
+        for ladder in self.get_ladders(jobs, budget_ladder):
+            if any(not isinstance(results[i][1], SearchTree) for i in ladder):
+                tree = trees[ladder[-1]]
+                nodes += int(tree.N[tree.root])
+        return(nodes)
+
+    def discard_searches(self, results):
+        #removes tree dumps of start_searches results that won't be parsed
+        for _, result in results:
+            if not isinstance(result, SearchTree):
+                try:
+                    os.remove(result)
+                except OSError:
+                    pass
+
+    def add_trees(self, jobs, trees):
+        for (position_id, _, _, _), g in zip(jobs, trees):
+            if position_id in self.G_dict:
+                self.G_dict[position_id].append(g)
+            else:
+                self.G_dict[position_id] = [g]
+
+    def get_changed_configs(self, position_id, fen, searches, budget_ladder=False):
+        #indices of configs whose tree has to be searched, searches: list of (parameters, board, nodes) per config
+        #configs that were analyzed in this position with the same key (see get_config_keys) keep their trees,
+        #a ladder is searched again as a whole when any of its configs changed
+        analyzed_fen, analyzed = self.analyzed_configs.get(position_id, (None, []))
+        nr_of_analyzed = min(len(analyzed), len(self.G_dict.get(position_id, [])))
+        keys, ladders = self.get_config_keys(searches, budget_ladder)
+        changed = set(i for i, key in enumerate(keys)
+                      if analyzed_fen != fen or i >= nr_of_analyzed or analyzed[i] != key)
+        return(sorted(i for ladder in ladders if changed.intersection(ladder) for i in ladder))
+
+    def get_updated_trees(self, position_id, fen, searches, changed, trees, budget_ladder=False):
+        #trees of all configs with the trees of changed configs (indices from get_changed_configs) replaced
+        #and those of removed configs dropped, and analyzed_configs entry of them
+        #returns None if plot data of the position doesn't have to be built again, G_dict and analyzed_configs
+        #are only set by install_position_data together with the data built from the trees
+        old_trees = self.G_dict.get(position_id, [])
+        if len(changed) == 0 and len(old_trees) == len(searches) and position_id in self.position_data:
+            return(None)
+        new_trees = dict(zip(changed, trees))
+        return([new_trees[i] if i in new_trees else old_trees[i] for i in range(len(searches))],
+               (fen, self.get_config_keys(searches, budget_ladder)[0]))
+
+    def get_ladder_order(self, position_id):
+        #config indices of the position by increasing nodes if all its configs were searched as one budget ladder,
+        #None otherwise, see get_config_keys
+        _, keys = self.analyzed_configs.get(position_id, (None, []))
+        order = sorted(range(len(keys)), key=lambda i: len(keys[i][2]))
+        if len(order) < 2 or [len(keys[i][2]) for i in order] != list(range(len(order))):
+            return(None)
+        return(order)
+
+    def get_previous_build(self, position_id, changed, G_list):
+        #previous of build_position_data for building the position again from trees G_list of get_updated_trees
+        #with changed configs, None if no config's tree is kept from the last build
+        position_data = self.position_data.get(position_id)
+        if position_data is None:
+            return(None)
+        merged_ids = position_data.merged_ids
+        if all(i in changed for i in range(min(len(merged_ids), len(G_list)))):
+            return(None)
+        return((position_data.merged_graph, merged_ids, position_data.membership,
+                get_layout_state(position_data.data), changed))
+
+    def clear_positions(self, position_ids=None):
+        #drops analysis results of given positions, all positions if None
+        if position_ids is None:
+            position_ids = list(self.G_dict) + list(self.position_data)
+        for position_id in set(position_ids):
+            for attribute in ('G_dict', 'analyzed_configs', 'position_data', 'heatmap_data_for_moves',
+                              'heatmap_data_for_board_states'):
+                getattr(self, attribute).pop(position_id, None)
+        figure_cache.invalidate(self.type, position_ids)
+
+    def get_root_eval(self, position_id, visible):
+        #eval of position by given config, None if not analyzed
+        position_data = self.position_data.get(position_id)
+        evals = position_data.root_evals if position_data is not None else []
+        return(evals[visible] if visible < len(evals) else None)
 
     def get_ML_range(self):
-        roots = [self.data[position_id]['root'] for position_id in self.data]
-        Ms = [root['visible'][visible]['eval']['M'] for root in roots for visible in root['visible']]
+        Ms = [eval['M'] for position_data in list(self.position_data.values()) for eval in position_data.root_evals]
         M_min = min(Ms)
         M_max = max(Ms)
         return(M_min, M_max)
 
-    def create_data(self, position_id, moves):
-        start = time.time()
-        G_merged, G_list = gt.merge_graphs(self.G_dict[position_id])
-        #print('graphs merged in', time.time() - start)
-        self.G_dict[position_id] = G_list
-        start = time.time()
-        #for n in topological_sort(G_merged.reverse()):
-        #    parent = gt.get_parent(G_merged, n)
-        #    if parent is None:
-        #        break
-        #    if 'N' not in G_merged.nodes[n]:
-        #        G_merged.nodes[n]['N'] = 1
-        #    if 'N' not in G_merged.nodes[parent]:
-        #        G_merged.nodes[parent]['N'] = 1 + G_merged.nodes[n]['N']
-        #    else:
-        #        G_merged.nodes[parent]['N'] += G_merged.nodes[n]['N']
-        #print('N calculation in', time.time() - start)
-        pos = pt.get_tree_layout(G_merged)
-        pos = pt.adjust_y(pos)
-        data = {}
-        node_counts = []
-
-        root = gt.get_root(G_merged)  # X-label
-        root_children = list(gt.get_children(G_merged, root))  # X-label
-        root_children.sort(key=lambda n: pos[n][0])  # X-label
-        x_labels = []  # X-label
-        x_label_vals = linspace(0, 1, len(root_children))
-        move_names = []
-        for child in root_children:
-            for G in G_list:
-                if child in G:
-                    move_names.append(G.nodes[child]['move'])
-                    break
-
-        for owner, G in enumerate(G_list):
-            start  = time.time()
-            #########################
-            x_lab = []  # X-label
-            G_non_root_nodes = int(G.nodes[gt.get_root(G)]['N']) - 1
-
-            # get best root child
-            root = gt.get_root(G)
-            edges = G.out_edges(root)
-            best_move = pt.get_best_edge(G, edges)[1]
-
-            for j, child in enumerate(root_children):  # X-label
-                if best_move == move_names[j]:
-                    val = '<a href="" style="color: ' + BEST_MOVE_COLOR + '"> <b>' + move_names[j] + '</b>' + '<br>'
-                else:
-                    val = '<b>' + move_names[j] + '</b>' + '<br>'
-                if child in G:  # X-label
-                    nodes = int(G.nodes[child]['N'])
-                    p = str(round(100 * nodes / G_non_root_nodes, 1)) + '%'
-
-                    val += p  # X-label
-                    if best_move == move_names[j]:
-                        val += '</a>'
-
-                x_lab.append(val)  # X-label
-            x_labels.append(x_lab)  # X-label
-            #########################
-            #print('x-axis stuff in', time.time() - start)
-            start = time.time()
-            G_pos = pt.get_own_pos(G, pos)
-            #print('get_own_pos', time.time() - start)
-            start = time.time()
-            pos_list = pt.branch_separation(G, G_pos)
-            #print('branch separation', time.time() - start)
-            start = time.time()
-            node_counts.append(gt.get_nodes_in_depth(G))
-            #print('node depths', time.time() - start)
-
-            pv_nodes = pt.get_pv_nodes(G)
-            miniboard_time = 0
-            node_metric_time = 0
-            start = time.time()
-            for i, branch in enumerate(pos_list):
-                for node in branch:
-                    if node not in data:
-                        parent = gt.get_parent(G, node)
-                        parent_point = [None, None] if parent is None else pos[parent]
-                        if not SHOW_UNICODE_BOARD:
-                            miniboard = ''
-                        else:
-                            miniboard = pt.get_miniboard_unicode(G, node, self.board, moves)
-                        if miniboard != '':
-                            miniboard = miniboard.replace('\n', '<br>')
-                        move = pt.get_move(G, node)
-                        if move == "":
-                            move = None
-                        data[node] = {'point': branch[node],
-                                      'parent': parent_point,
-                                      'miniboard':  miniboard,
-                                      #'fen': fen,
-                                      'move': move,
-                                      'visible': {}
-                                      }
-                    node_metrics = pt.get_node_metric_text(G, node, SHOW_UNICODE_BOARD)
-                    edge_type = ''
-                    if node in pv_nodes:
-                        edge_type = 'pv'
-                    if node == 'root':
-                        type = 'root'
-                    elif i%2 == 0:
-                        type = 'even'
-                    elif i%2 == 1:
-                        type = 'odd'
-                    data[node]['visible'][owner] = {'type': (type, edge_type), 'metric': node_metrics}
-                    if type == 'root':
-                        eval = pt.get_node_eval(G, node)
-                        data[node]['visible'][owner]['eval'] = eval
-            #print('Tree process time:', (time.time() - start))
-        self.data[position_id] = data
-        self.merged_graphs[position_id] = G_merged
-        y_tick_labels, y_tick_values = pt.get_y_ticks(pos)
-        y_range = [-1, len(y_tick_values)]
-        x_range = pt.get_x_range(pos)
-        self.x_range[position_id] = x_range
-        self.y_range[position_id] = y_range
-        self.y_tick_labels[position_id] = y_tick_labels
-        self.y_tick_values[position_id] = y_tick_values
-
-
-        max_len = max([len(nc) for nc in node_counts])
-        node_counts = [['0'] * (max_len - len(nc)) + nc for nc in node_counts]
-        y2_max = max(max([int(x) for x in nc]) for nc in node_counts)
-        self.y2_range[position_id] = [0, y2_max]
-        self.data_depth[position_id] = {i: (list(range(len(node_count))), list(map(int, node_count))) for i, node_count in enumerate(node_counts)}
-        self.x_tick_labels[position_id] = {i: x_label_list for i, x_label_list in enumerate(x_labels)}
-        self.x_tick_values[position_id] = x_label_vals
-
-    def calculate_heatmap_data(self, position_id, type):
-        G = self.merged_graphs[position_id]
+    def create_data(self, position_id, moves, G_list, analyzed, previous=None):
+        self.install_position_data(position_id, build_position_data(G_list, moves, previous), G_list, analyzed)
+
+    def install_position_data(self, position_id, position_data, G_list=None, analyzed=None):
+        #position_data as returned by build_position_data, possibly computed in another process
+        #G_list and analyzed of get_updated_trees that it was built from are recorded in the same step,
+        #a position whose build failed keeps the trees and analyzed configs of its last build
+        position_data = position_data._replace(data=PositionArrays.attach(position_data.data))
+        if G_list is not None:
+            self.G_dict[position_id] = G_list
+            self.analyzed_configs[position_id] = analyzed
+        self.position_data[position_id] = position_data
+        figure_cache.invalidate(self.type, [position_id])
+
+    def get_heatmap_data(self, position_id, position_data, type):
+        #heatmap data of each config for the PositionData of position_id, calculated on first use
+        moves_only = type in ('origin', 'destination')
+        cached = (self.heatmap_data_for_moves if moves_only else self.heatmap_data_for_board_states).get(position_id)
+        if cached is not None and cached[0] is position_data:
+            return(cached[1])
+        print('generating heat map data')
+        data_moves, data_board_states = self.calculate_heatmap_data(position_id, position_data, type)
+        return(data_moves if moves_only else data_board_states)
+
+    def calculate_heatmap_data(self, position_id, position_data, type):
+        G = position_data.merged_graph
         if self.type == 'pgn':
             game_data = game_data_pgn
         else:
@@ -613,14 +658,14 @@ class TreeData:
         #don't calculate heat maps related to board states if such heatmap type is not visible
         calc_board_state_related_data = type not in ('origin', 'destination')
 
-        for node in topological_sort(G):
+        for node in G: #breadth first order, parents come before children
             parent = gt.get_parent(G, node)
             if parent is None:
                 boards[node] = initial_board
                 depths[node] = 0
             else:
                 board = boards[parent].copy(stack=False)
-                move_uci = G.nodes[node]['move']
+                move_uci = G.get_move(node)
                 move = chess.Move.from_uci(move_uci)
                 move_lan = board.lan(move)
                 piece = move_lan[0]
@@ -668,12 +713,10 @@ class TreeData:
 
         data_moves = []
         data_board_states = []
-        for G in self.G_dict[position_id]:
+        for ids in position_data.merged_ids:
             move_related_data = {}
             board_state_related_data = {}
-            for node in G:
-                if node == 'root':
-                    continue
+            for node in ids[1:].tolist(): #skip root
                 key, value, key2, value2 = nodes[node]
                 x_origin, y_origin = value['origin']
                 x_destination, y_destination = value['destination']
@@ -709,15 +752,20 @@ class TreeData:
             if calc_board_state_related_data:
                 data_board_states.append((board_state_related_data))
 
-        self.heatmap_data_for_moves[position_id] = data_moves
+        self.heatmap_data_for_moves[position_id] = (position_data, data_moves)
         if calc_board_state_related_data:
-            self.heatmap_data_for_board_states[position_id] = data_board_states
+            self.heatmap_data_for_board_states[position_id] = (position_data, data_board_states)
+        return(data_moves, data_board_states)
 
 
 lc0 = leela_engine(None)
+engine_pool = EnginePool(lc0, ENGINE_POOL_SIZE, ENGINE_THREADS)
+search_cache = SearchCache(SEARCH_CACHE_DIR, SEARCH_CACHE_MAX_MB * 2**20)
+analysis_queue = AnalysisQueue(ENGINE_POOL_SIZE, POSTPROCESS_WORKERS)
+figure_cache = FigureCache(FIGURE_CACHE_MAX_NODES)
 
-tree_data_pgn = TreeData(lc0, 'pgn')
-tree_data_fen = TreeData(lc0, 'fen')
+tree_data_pgn = TreeData(lc0, 'pgn', engine_pool, search_cache)
+tree_data_fen = TreeData(lc0, 'fen', engine_pool, search_cache)
 
 game_data_pgn = GameData('pgn')
 game_data_fen = GameData('fen')
@@ -0,0 +1,104 @@
+import numpy as np
+
+#reader for the gml dialect written by lc0_tree, e.g.
+#graph [
+#  directed 1
+#  node [
+#    id 0
+#    N "800"
+#    Q "0.123"
+#    ...
+#    move ""
+#  ]
+#  edge [
+#    source 0
+#    target 1
+#  ]
+#]
+#node and edge blocks are flat (no nested lists) and attribute values contain no whitespace,
+#so the whole file can be tokenized with plain str.split instead of a generic gml tokenizer
+
+INT_COLUMNS = ('N',)
+FLOAT_COLUMNS = ('Q', 'P', 'D', 'M')
+
+
+def split_blocks(text):
+    #returns attribute dicts of node blocks and edge blocks
+    body = text[text.index('[') + 1:] #skip "graph ["
+    nodes = []
+    edges = []
+    for block in body.split(']'):
+        tokens = block.split()
+        if '[' not in tokens:
+            continue
+        if tokens[1] != '[': #graph level attributes before the block, e.g. "directed 1"
+            tokens = tokens[tokens.index('[') - 1:]
+        attributes = dict(zip(tokens[2::2], tokens[3::2]))
+        if tokens[0] == 'node':
+            nodes.append(attributes)
+        elif tokens[0] == 'edge':
+            edges.append(attributes)
+    return(nodes, edges)
+
+
+def unquote(values):
+    return([value[1:-1] if value[:1] == '"' else value for value in values])
+
+
+def to_int_ids(ids):
+    #lc0_tree uses integer ids, fall back to strings for anything else
+    try:
+        return(np.array(ids, dtype=np.int64))
+    except ValueError:
+        return(np.array(ids, dtype=object))
+
+
+def numeric_column(nodes, key, dtype):
+    values = np.array([node.get(key, 'nan') for node in nodes])
+    values = np.char.strip(values, '"') if len(values) else values
+    return(values.astype(np.float64).astype(dtype))
+
+
+def ids_to_indices(ids, query):
+    #maps node ids to row indices with a sorted lookup instead of a per-edge dict
+    order = np.argsort(ids, kind='stable')
+    sorted_ids = ids[order]
+    positions = np.searchsorted(sorted_ids, query)
+    positions = np.minimum(positions, len(sorted_ids) - 1)
+    if len(query) and not np.array_equal(sorted_ids[positions], query):
+        raise ValueError('gml edge refers to unknown node id')
+    return(order[positions])
+
+
+def parse_tree_gml(text):
+    nodes, edges = split_blocks(text)
+
+    ids = to_int_ids(unquote([node['id'] for node in nodes]))
+    columns = {'id': ids,
+               'move': unquote([node.get('move', '""') for node in nodes])}
+    for key in INT_COLUMNS:
+        columns[key] = numeric_column(nodes, key, np.int64)
+    for key in FLOAT_COLUMNS:
+        columns[key] = numeric_column(nodes, key, np.float64)
+
+    parent = np.full(len(nodes), -1, dtype=np.int64)
+    if edges:
+        sources = to_int_ids(unquote([edge['source'] for edge in edges]))
+        targets = to_int_ids(unquote([edge['target'] for edge in edges]))
+        if ids.dtype == object or sources.dtype == object or targets.dtype == object:
+            index = {node_id: i for i, node_id in enumerate(ids)}
+            parent[[index[t] for t in targets]] = [index[s] for s in sources]
+        else:
+            parent[ids_to_indices(ids, targets)] = ids_to_indices(ids, sources)
+    columns['parent'] = parent
+    return(columns)
+
+
+def read_tree_gml(path):
+    #single pass reader for lc0_tree dumps
+    #returns dict of columns: 'id', 'parent' (row index of parent, -1 for root), 'move',
+    #N as integers and Q, P, D, M as floats (nan when engine didn't write the attribute)
+    with open(path, 'r') as f:
+        text = f.read()
+    return(parse_tree_gml(text))
+
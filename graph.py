@@ -5,7 +5,17 @@ import dash_html_components as html
 from dash.dependencies import Input, Output, State
 import plotly.graph_objs as go
 from plotly import subplots
-from global_data import tree_data_pgn, tree_data_fen, game_data_pgn, game_data_fen, config_data
+from global_data import tree_data_pgn, tree_data_fen, game_data_pgn, game_data_fen, config_data, analysis_queue, \
+    figure_cache
+from analysis_queue import QUEUED, RUNNING, DONE, CANCELLED
+from position_arrays import ROOT_TYPE, EVEN_TYPE, ODD_TYPE
+from level_of_detail import get_lod_nodes
+from spatial_index import GridIndex
+from raster import Raster, RASTER_AVAILABLE
+from growth import get_growth_groups, get_growth_types
+from searchtree import MOVE_TABLE, ROOT
+from constants import SHOW_UNICODE_BOARD
+import numpy as np
 
 from server import app
 from miniboard import node_info
@@ -33,6 +43,18 @@ MONO_FONT_FAMILY = 'BundledDejavuSansMono'
 HOVER_FONT_SIZE = 15
 
 NODE_LIMIT_FOR_WEBGL = 2000 #switch to WEBGL above certain nodes
+NODE_LIMIT_FOR_COMPACT_PAYLOAD = 10000 #quantize coordinates and write edge depths as ints above certain nodes
+LOD_NODE_LIMIT = 20000 #collapse subtrees with few visits above certain nodes, zooming in expands them
+VIEWPORT_POINT_BUDGET = 20000 #max number of nodes sent for zoomed area, subtrees in it are collapsed above that
+VIEWPORT_MARGIN = 0.5 #nodes are sent also this fraction of zoomed area's width and height around it
+RASTER_NODE_LIMIT = 200000 #draw edges and nodes as a server side image above certain nodes, needs Pillow
+RASTER_WIDTH, RASTER_HEIGHT = 1600, 1000 #pixels of the image per shown area of the tree plot
+RASTER_OVERLAY_NODES = 2000 #most visited nodes drawn as interactive points over the image
+COLLAPSED_NODE_COLOR = 'rgb(127,127,127)'
+NO_POSITIONS = 'no-positions' #analysis trigger value when there was nothing to analyze
+GROWTH_NODE_LIMIT = 200000 #growth animation collapses subtrees with few visits above certain nodes
+GROWTH_FRAME_DURATION = 800 #milliseconds each config is shown when growth animation plays
+GROWTH_CONTROLS_MARGIN = 70 #pixels above the plot for play button and config slider of growth animation
 
 
 def empty_figure():
@@ -87,57 +109,230 @@ def empty_figure():
     return(figure)
 
 
-def get_data(data, visible):
-    start = time.time()
-    points_odd, node_text_odd, node_ids_odd = [], [], []
-    points_even, node_text_even, node_ids_even = [], [], []
-    points_root, node_text_root, node_ids_root = [], [], []
-    x_edges, y_edges = [], []
-    x_edges_pv, y_edges_pv = [], []
-    for node_id in data:
-        node = data[node_id]
-        node_state_info = node['visible'].get(visible)
-        if node_state_info is None: # node is not visible for this state
-            continue
-        type, edge_type = node_state_info['type']
-        node_metrics = node_state_info['metric']
-
-        point = node['point']
-        x_parent, y_parent = node['parent']
-        node_text = node['miniboard'] + node_metrics
-
-        if type == 'odd':
-            points_odd.append(point)
-            node_text_odd.append(node_text)
-            node_ids_odd.append(node_id)
-        elif type == 'even':
-            points_even.append(point)
-            node_text_even.append(node_text)
-            node_ids_even.append(node_id)
-        elif type == 'root':
-            points_root.append(point)
-            node_text_root.append(node_text)
-            node_ids_root.append(node_id)
-        if edge_type == 'pv':
-            x_edges_pv += [point[0], x_parent, None]
-            y_edges_pv += [point[1], y_parent, None]
-        else:
-            x_edges += [point[0], x_parent, None]
-            y_edges += [point[1], y_parent, None]
+def get_edges(x, y, parents, node_ids):
+    #polylines from nodes to their parents as flat arrays of (node, parent, nan) triplets,
+    #nan separates the edges and root has nan as parent
+    parent_ids = parents[node_ids]
+    has_parent = parent_ids >= 0
+    x_edges = np.full((len(node_ids), 3), np.nan)
+    y_edges = np.full((len(node_ids), 3), np.nan)
+    x_edges[:, 0] = x[node_ids]
+    y_edges[:, 0] = y[node_ids]
+    x_edges[has_parent, 1] = x[parent_ids[has_parent]]
+    y_edges[has_parent, 1] = y[parent_ids[has_parent]]
+    return(x_edges.ravel(), y_edges.ravel())
+
+
+def get_data(cache_key, data, G_merged, visible, viewport=None):
+    #memoized in figure cache under cache_key (position_mode, position_id) for the PositionArrays object,
+    #so reanalyzed positions get new entries and switching between configs of a position only builds
+    #each config's arrays once
+    #trees over LOD_NODE_LIMIT nodes are drawn with collapsed subtrees, when zoomed only nodes
+    #inside viewport and its margin are drawn, with collapsed subtrees above VIEWPORT_POINT_BUDGET nodes
+    if visible >= data.number_of_configs(): # config not yet analyzed
+        return(build_plot_data(data, G_merged, 0, np.zeros(0, dtype=np.int32), False))
+    order = data['order']
+    node_ids = order[data['visible'][visible][order]]
+    collapsed = None
+    if len(node_ids) <= LOD_NODE_LIMIT:
+        viewport = None
+    elif viewport is None:
+        drawn, collapsed = get_lod_nodes(G_merged, data['N'][visible], data['visible'][visible], data['pv'][visible],
+                                         LOD_NODE_LIMIT)
+        node_ids = node_ids[drawn[node_ids]]
+    else:
+        visible_mask = data['visible'][visible]
+        window_ids = get_window_nodes(cache_key, data, viewport)
+        window_ids = window_ids[visible_mask[window_ids]]
+        drawn = np.zeros(len(visible_mask), dtype=bool)
+        drawn[window_ids] = True
+        if len(window_ids) > VIEWPORT_POINT_BUDGET:
+            in_window = drawn
+            drawn, collapsed = get_lod_nodes(G_merged, data['N'][visible], visible_mask, data['pv'][visible],
+                                             VIEWPORT_POINT_BUDGET, in_window)
+            drawn &= in_window
+        node_ids = node_ids[drawn[node_ids]]
+    compact = len(node_ids) >= NODE_LIMIT_FOR_COMPACT_PAYLOAD
+    if viewport is not None: #zoomed views are not memoized, finished figures are still cached
+        return(build_plot_data(data, G_merged, visible, node_ids, compact, collapsed))
+    memo_key = cache_key + ('plot data', visible, compact)
+    plot_data = figure_cache.get(memo_key, data)
+    if plot_data is None:
+        plot_data = build_plot_data(data, G_merged, visible, node_ids, compact, collapsed)
+        figure_cache.put(memo_key, data, plot_data, len(node_ids))
+    return(plot_data)
+
+
+def get_raster_data(cache_key, data, G_merged, visible, x_range, y_range, viewport=None):
+    #trees over RASTER_NODE_LIMIT nodes are drawn as an image of the plot area (and margin around the viewport),
+    #most visited nodes, root and pv nodes are drawn over it as points with hover and click
+    #returns get_data result of the drawn points and the layout image
+    memo_key = cache_key + ('raster', visible)
+    result = figure_cache.get(memo_key, data) if viewport is None else None
+    if result is not None:
+        return(result)
+    (x0, x1), (y0, y1) = x_range, y_range
+    width, height = RASTER_WIDTH, RASTER_HEIGHT
+    if viewport is not None:
+        #image keeps the resolution of the viewport, margin is added around it within the plot area
+        view_x0, view_x1 = max(viewport[0], x0), min(viewport[1], x1)
+        view_y0, view_y1 = max(viewport[2], y0), min(viewport[3], y1)
+        if view_x0 < view_x1 and view_y0 < view_y1:
+            x_margin, y_margin = VIEWPORT_MARGIN * (view_x1 - view_x0), VIEWPORT_MARGIN * (view_y1 - view_y0)
+            window = (max(view_x0 - x_margin, x0), min(view_x1 + x_margin, x1),
+                      max(view_y0 - y_margin, y0), min(view_y1 + y_margin, y1))
+            width = int(round(RASTER_WIDTH * (window[1] - window[0]) / (view_x1 - view_x0)))
+            height = int(round(RASTER_HEIGHT * (window[3] - window[2]) / (view_y1 - view_y0)))
+            x0, x1, y0, y1 = window
+    x, y, parents = data['x'], data['y'], data['parent']
+    visible_mask = data['visible'][visible]
+    types = data['type'][visible]
+    raster = Raster((x0, x1, y0, y1), width, height, [EDGE_COLOR] + BRANCH_COLORS + [ROOT_NODE_COLOR])
+    children = np.nonzero(visible_mask & (parents >= 0))[0]
+    raster.draw_segments(x[children], y[children], x[parents[children]], y[parents[children]], EDGE_COLOR)
+    for type, color in ((ODD_TYPE, BRANCH_COLORS[1]), (EVEN_TYPE, BRANCH_COLORS[0]), (ROOT_TYPE, ROOT_NODE_COLOR)):
+        ids = np.nonzero(visible_mask & (types == type))[0]
+        raster.draw_points(x[ids], y[ids], color)
+    image = raster.to_layout_image()
+
+    in_window = visible_mask & (x >= x0) & (x <= x1) & (y >= y0) & (y <= y1)
+    overlay = in_window & (data['pv'][visible] | (np.arange(len(x)) == ROOT))
+    candidates = np.nonzero(in_window)[0]
+    if len(candidates) > RASTER_OVERLAY_NODES:
+        most_visited = np.argpartition(-data['N'][visible][candidates], RASTER_OVERLAY_NODES)
+        candidates = candidates[most_visited[:RASTER_OVERLAY_NODES]]
+    overlay[candidates] = True
+    order = data['order']
+    node_ids = order[overlay[order]]
+    result = (build_plot_data(data, G_merged, visible, node_ids, len(node_ids) >= NODE_LIMIT_FOR_COMPACT_PAYLOAD),
+              image)
+    if viewport is None:
+        figure_cache.put(memo_key, data, result, len(node_ids))
+    return(result)
+
+
+def get_window_nodes(cache_key, data, viewport):
+    #ids of merged nodes inside viewport and its margin, spatial index is kept in figure cache like get_data
+    index_key = cache_key + ('spatial index',)
+    spatial_index = figure_cache.get(index_key, data)
+    if spatial_index is None:
+        spatial_index = GridIndex(data['x'], data['y'])
+        figure_cache.put(index_key, data, spatial_index, len(data['x']))
+    x0, x1, y0, y1 = viewport
+    x_margin, y_margin = VIEWPORT_MARGIN * (x1 - x0), VIEWPORT_MARGIN * (y1 - y0)
+    return(spatial_index.query(x0 - x_margin, x1 + x_margin, y0 - y_margin, y1 + y_margin))
+
+
+def get_viewport(relayout_data):
+    #zoomed area of the tree plot from relayoutData, None for the whole tree and dash.no_update
+    #for relayout events that don't change the tree plot's axes
+    if relayout_data.get('xaxis.autorange') or relayout_data.get('yaxis.autorange'):
+        return(None)
+    if 'xaxis.range[0]' in relayout_data:
+        x0, x1 = relayout_data['xaxis.range[0]'], relayout_data['xaxis.range[1]']
+    elif 'xaxis.range' in relayout_data:
+        x0, x1 = relayout_data['xaxis.range']
+    else:
+        return(dash.no_update)
+    y0, y1 = relayout_data.get('yaxis.range[0]'), relayout_data.get('yaxis.range[1]')
+    if y0 is None:
+        y0, y1 = relayout_data.get('yaxis.range', (-np.inf, np.inf))
+    return((min(x0, x1), max(x0, x1), min(y0, y1), max(y0, y1)))
+
+
+def viewport_to_store(position_key, viewport):
+    #data of the graph-viewport store, zoomed area is kept per browser tab for the position it was zoomed in
+    #json has no infinity, unbounded y range of the viewport is stored as None
+    if viewport is not None:
+        viewport = [None if np.isinf(value) else value for value in viewport]
+    return({'key': list(position_key), 'viewport': viewport})
+
+
+def viewport_from_store(viewport_store):
+    #zoomed area (x0, x1, y0, y1) kept in the graph-viewport store, None for the whole tree
+    if viewport_store is None or viewport_store['viewport'] is None:
+        return(None)
+    x0, x1, y0, y1 = viewport_store['viewport']
+    return((x0, x1, -np.inf if y0 is None else y0, np.inf if y1 is None else y1))
 
-    x_odd, y_odd = zip(*points_odd) if points_odd != [] else ([], [])
-    x_even, y_even = zip(*points_even) if points_even != [] else ([], [])
-    x_root, y_root = zip(*points_root) if points_root != [] else ([], [])
+
+def quantize(x):
+    #rounds x coordinates (range 0..1) to a grid that still keeps neighbouring nodes apart, shortens json numbers
+    decimals = int(np.ceil(np.log10(max(len(x), 1)))) + 2
+    return(np.round(x, decimals))
+
+
+def edge_depths_to_payload(y_edges, compact):
+    #in compact json, edge depths are written as ints with null separators instead of floats
+    if not compact:
+        return(y_edges.tolist())
+    separators = np.isnan(y_edges)
+    y_edges = np.where(separators, 0, y_edges).astype(np.int64).astype(object)
+    y_edges[separators] = None
+    return(y_edges.tolist())
+
+
+def build_plot_data(data, G_merged, visible, node_ids, compact, collapsed=None):
+    #data: PositionArrays of the position, G_merged: merged tree of the position, visible: config index,
+    #node_ids: drawn nodes in drawing order, compact: encode arrays for a smaller figure payload,
+    #collapsed: mask of nodes drawn as collapsed subtrees or None
+    start = time.time()
+    x, y = data['x'], data['y']
+    if compact:
+        x = quantize(x)
+    types = data['type'][visible][node_ids]
+    pv = data['pv'][visible][node_ids]
+    if collapsed is not None:
+        types = np.where(collapsed[node_ids], -1, types)
+
+    traces = []
+    for type in (ODD_TYPE, EVEN_TYPE, ROOT_TYPE, -1):
+        ids = node_ids[types == type]
+        traces.append((x[ids].tolist(), y[ids].tolist()) + get_hover_data(data, G_merged, visible, ids))
+    x_collapsed, y_collapsed, customdata_collapsed, template_collapsed = traces.pop()
+    template_collapsed = 'Collapsed subtree, zoom in to expand<br>' + template_collapsed
+    #plain lists, json encoder writes nan separators as null
+    x_edges, y_edges = get_edges(x, y, data['parent'], node_ids[~pv])
+    x_edges, y_edges = x_edges.tolist(), edge_depths_to_payload(y_edges, compact)
+    x_edges_pv, y_edges_pv = get_edges(x, y, data['parent'], node_ids[pv])
+    x_edges_pv, y_edges_pv = x_edges_pv.tolist(), edge_depths_to_payload(y_edges_pv, compact)
+
+    (x_odd, y_odd, customdata_odd, template_odd), \
+    (x_even, y_even, customdata_even, template_even), \
+    (x_root, y_root, customdata_root, template_root) = traces
 
     print('Tree plot data fetched in', time.time() - start, 's')
 
 
-    return (x_odd, y_odd, node_text_odd, node_ids_odd,
-            x_even, y_even, node_text_even, node_ids_even,
-            x_root, y_root, node_text_root, node_ids_root,
+    return (x_odd, y_odd, customdata_odd, template_odd,
+            x_even, y_even, customdata_even, template_even,
+            x_root, y_root, customdata_root, template_root,
+            x_collapsed, y_collapsed, customdata_collapsed, template_collapsed,
             x_edges, y_edges,
             x_edges_pv, y_edges_pv,)
 
+
+def get_hover_data(data, G_merged, visible, node_ids):
+    #customdata rows and hovertemplate of nodes, hover texts are formatted by the browser from the rows
+    #row starts with node id (used by node click and hover callbacks), then miniboard, move and metrics
+    #metrics that no node of the trace has are left out of the template
+    columns = [node_ids.tolist()]
+    template = ''
+    if SHOW_UNICODE_BOARD:
+        template += '%{customdata[1]}<br> <br>'
+        columns.append(data.get_boards(node_ids))
+    template += 'Move: %{customdata[' + str(len(columns)) + ']}<br>'
+    columns.append([MOVE_TABLE[code] for code in G_merged.move_codes[node_ids].tolist()])
+    for key in ('N', 'Q', 'D', 'M', 'P'):
+        values = data[key][visible][node_ids]
+        if key == 'Q':
+            values = np.where(node_ids == ROOT, -1.0*values, values) #root's Q from side to move
+        elif key != 'N' and np.isnan(values).all():
+            continue
+        template += key + ': %{customdata[' + str(len(columns)) + ']}<br>'
+        columns.append(values.tolist())
+    return([list(row) for row in zip(*columns)], template + '<extra></extra>')
+
 def tree_graph():
     graph_component = html.Div(style={'height': '100%', 'width': '100%'})
     loading_component = html.Div(dcc.Loading(children=[html.Div(id='loading_trigger', style={'display': 'none'})], style={'flex': 1}),
@@ -157,13 +352,21 @@ def tree_graph():
                                       'position': 'relative',
                                       #'border': '5px solid red',
                                       }),
-                                     html.Div(dcc.Slider(id='slider1',
-                                                         min=0,
-                                                         value=0,
-                                                         step=None,
-                                                         ),
-                                              style={'height': '12.5%', 'width': '95%', 'margin': 'auto'}),#updatemode='drag'
-                                     html.Div(id='hidden-div-slider-state', style={'display': 'none'}, children='test')
+                                     html.Div(children=[html.Div(dcc.Slider(id='slider1',
+                                                                            min=0,
+                                                                            value=0,
+                                                                            step=None,
+                                                                            ),
+                                                                 style={'flex': 1}),
+                                                        dcc.Checklist(id='growth-mode-selector',
+                                                                      options=[{'label': 'Growth animation',
+                                                                                'value': 'growth'}],
+                                                                      value=[])],
+                                              style={'height': '12.5%', 'width': '95%', 'margin': 'auto',
+                                                     'display': 'flex'}),#updatemode='drag'
+                                     html.Div(id='hidden-div-slider-state', style={'display': 'none'}, children='test'),
+                                     #zoomed area of the shown position, see viewport_to_store
+                                     dcc.Store(id='graph-viewport', data=None)
                                      ],
                            style={'height': '90%', 'width': '100%', 'float': 'left'}
                            )
@@ -173,8 +376,7 @@ def tree_graph():
 
 
 @app.callback(
-    [Output('generate-data-button', 'title'),
-    Output('loading_trigger', 'children')],
+    Output('loading_trigger', 'children'),
     [Input('generate-data-button', 'n_clicks_timestamp'),
      Input('generate-data-selected-button', 'n_clicks_timestamp'),
      ],
@@ -184,15 +386,17 @@ def tree_graph():
      State('nodes_input', 'value'),
      State('net-mode-selector', 'value'),
      State('net_selector', 'value'),
+     State('ladder-mode-selector', 'value'),
      State('position-mode-selector', 'value')]
 )
-def generate_data(n_clicks_all_timestamp, n_clicks_selected_timestamp, marks, active_cell, nodes_mode, global_nodes, net_mode, global_net, position_mode):
+def generate_data(n_clicks_all_timestamp, n_clicks_selected_timestamp, marks, active_cell, nodes_mode, global_nodes, net_mode, global_net, ladder_mode, position_mode):
+    #analysis itself runs in the background analysis queue, returns id of the submitted job
     if n_clicks_selected_timestamp is None:
         n_clicks_selected_timestamp = -1
     if n_clicks_all_timestamp is None:
         n_clicks_all_timestamp = -1
     if n_clicks_all_timestamp == -1 and n_clicks_selected_timestamp == -1:
-        return(dash.no_update, dash.no_update)
+        return(dash.no_update)
 
     if position_mode == 'pgn':
         tree_data = tree_data_pgn
@@ -202,8 +406,8 @@ def generate_data(n_clicks_all_timestamp, n_clicks_selected_timestamp, marks, ac
         game_data = game_data_fen
 
     data = game_data.data
-    if data is None:
-        return ("No positions to analyze", dash.no_update)
+    if data is None or (n_clicks_selected_timestamp > n_clicks_all_timestamp and active_cell is None):
+        return(NO_POSITIONS)
 
     is_analyze_selected = False
     if n_clicks_selected_timestamp > n_clicks_all_timestamp:
@@ -212,53 +416,271 @@ def generate_data(n_clicks_all_timestamp, n_clicks_selected_timestamp, marks, ac
         position_indices = [data[row_index]['ply']]
     else:
         position_indices = [row['ply'] for row in data]
-    nr_of_positions = len(position_indices)
 
     #net = '/home/jusufe/leelas/graph_analysis3/nets60T/weights_run1_62100.pb.gz'
     #engine = '/home/jusufe/lc0_farmers/build/release/lc0'# '/home/jusufe/lc0_test4/build/release/lc0'
     #tree_data.args = [engine, '--weights=' + net]
 
     board = game_data.board
-    if not is_analyze_selected:
-        tree_data.G_dict = {}
-        tree_data.merged_graphs = {}
-        tree_data.data = {}
-        tree_data.heatmap_data_for_moves = {}
-        tree_data.heatmap_data_for_board_states = {}
-    else:
-        for position_id in position_indices:
-            tree_data.G_dict.pop(position_id, None)  # clear graph data for this position
-            tree_data.merged_graphs.pop(position_id, None)
-            tree_data.heatmap_data_for_moves.pop(position_id, None)
-            tree_data.heatmap_data_for_board_states.pop(position_id, None)
-    for config_i in range(len(marks)):
-        nodes = config_data.get_nodes(config_i, nodes_mode, global_nodes)
-        for position_id in position_indices:
-            game_data.set_board_position(position_id)
-            if net_mode != ['global']:
-                global_net = None
-            configurations = config_data.get_configurations(config_i, global_net)
-            tree_data.run_search(position_id, configurations, board, nodes)
-
+    if net_mode != ['global']:
+        global_net = None
+    configs = [(config_data.get_configurations(config_i, global_net), config_data.get_nodes(config_i, nodes_mode, global_nodes))
+               for config_i in range(len(marks))]
+    positions = []
     for position_id in position_indices:
         game_data.set_board_position(position_id)
-        fen = board.fen()
-        tree_data.create_data(position_id, fen)
-    if is_analyze_selected:
-        return('', str(nr_of_positions))
-    return(f'All {str(nr_of_positions)} positions analyzed', str(nr_of_positions))
+        searches = [(configurations, board.copy(), nodes) for configurations, nodes in configs]
+        positions.append((position_id, board.fen(), searches))
+    #config table counts as analyzed once the job has finished, with the rows it was submitted with
+    analyzed_data = [dict(row) for row in config_data.data]
+    job = analysis_queue.submit(tree_data, positions, not is_analyze_selected, ladder_mode == ['ladder'],
+                                lambda: config_data.set_analyzed(analyzed_data))
+    return(str(job.job_id))
+
+@app.callback(
+    [Output('generate-data-button', 'title'),
+     Output('analysis-progress', 'children'),
+     Output('analysis-progress-interval', 'disabled')],
+    [Input('analysis-progress-interval', 'n_intervals'),
+     Input('loading_trigger', 'children'),
+     Input('cancel-analysis-button', 'n_clicks')],
+)
+def update_analysis_progress(n_intervals, job_id, n_clicks_cancel):
+    #polls progress of the latest analysis job
+    #title of analyze button is updated whenever new positions are ready, which refreshes the views
+    triggerers = dash.callback_context.triggered
+    if any(triggerer['prop_id'] == 'cancel-analysis-button.n_clicks' for triggerer in triggerers):
+        if n_clicks_cancel is not None:
+            analysis_queue.cancel()
+    if job_id == NO_POSITIONS:
+        return('No positions to analyze', 'No positions to analyze', True)
+    job = None if job_id is None else analysis_queue.get_job(int(job_id))
+    if job is None:
+        return(dash.no_update, '', True)
+
+    nr_of_positions = len(job.positions)
+    queued = analysis_queue.get_queued_count()
+    if job.status == QUEUED:
+        progress = f'Waiting, {queued} job(s) in queue'
+    elif job.status == RUNNING:
+        progress = f'Analyzing {job.positions_done}/{nr_of_positions} positions, {job.nodes_per_second():.0f} nodes/s'
+    elif job.status == DONE:
+        progress = f'Analyzed {nr_of_positions} position(s), {job.nodes_per_second():.0f} nodes/s'
+    elif job.status == CANCELLED:
+        progress = f'Cancelled after {job.positions_done}/{nr_of_positions} positions'
+    else:
+        progress = f'Analysis failed: {job.error}'
+    if job.status != QUEUED and queued:
+        progress += f', {queued} job(s) in queue'
+
+    #report finished positions only once, setting title triggers refresh of views
+    reported = (job.status, job.positions_done)
+    if job.reported == reported:
+        title = dash.no_update
+    elif job.status == DONE and job.analyze_all:
+        title = f'All {str(nr_of_positions)} positions analyzed'
+    elif job.status == DONE:
+        title = ''
+    else:
+        title = f'{job.positions_done}/{nr_of_positions} positions analyzed'
+    job.reported = reported
+    return(title, progress, job.is_finished() and queued == 0)
+
+def get_depth_tick_labels(y_hist, y_tick_labels):
+    #node counts per depth as tick labels of the histogram
+    #pad labels for nice alignment
+    y_hist_labels = ['0' for _ in range(len(y_tick_labels) - len(y_hist))] + list(map(str, y_hist))
+    max_y2_label_len = max(map(len, y_hist_labels))
+    return([label.rjust(max_y2_label_len, ' ') for label in y_hist_labels])
+
+
+def get_layout(position_data, visible):
+    #layout of the tree figure and the histogram of nodes per depth of config visible
+    x_hist, y_hist = position_data.data_depth[visible]
+
+    trace_depth_histogram = go.Bar(x=y_hist, y=x_hist, orientation='h',
+                                   showlegend=False, hoverinfo='skip',
+                                   marker=dict(color=BAR_COLOR))
+
+    x_range = position_data.x_range
+    y_range = position_data.y_range
+    y_tick_values = position_data.y_tick_values
+    y_tick_labels = position_data.y_tick_labels
+
+    y2_tick_labels = get_depth_tick_labels(y_hist, y_tick_labels)
+
+    y2_range = position_data.y2_range
+    x_tick_labels = position_data.x_tick_labels[visible]
+    x_tick_values = position_data.x_tick_values
+
+
+    layout = go.Layout(#title=dict(text='Leela tree Visualization', x=0.5, xanchor="center"),
+                       annotations=[
+                                    dict(
+                                        x=1.025,
+                                        y=0.5,
+                                        showarrow=False,
+                                        text='Nodes per depth',
+                                        xref='paper',
+                                        yref='paper',
+                                        textangle=90,
+                                        font=dict(family=MONO_FONT_FAMILY, size=RIGHT_TITLE_SIZE, color=FONT_COLOR)
+                                    ),
+                                ],
+                       xaxis={'title': 'Visit distribution',
+                              'range': x_range,
+                              'zeroline': False,
+                              'showgrid': False,
+                              'domain': [0.0, 0.91],
+                              'tickvals': x_tick_values,
+                              'ticktext': x_tick_labels},
+                       yaxis={'title': 'Depth',
+                              'range': y_range,
+                              'ticktext': y_tick_labels,
+                              'tickvals': y_tick_values,
+                              'zeroline': False,
+                              'showgrid': True,
+                              'gridcolor': GRID_COLOR},
+                       yaxis2={'title': '',
+                               'range': y_range,
+                               'showticklabels': True,
+                               'side': 'left',
+                               'ticktext': y2_tick_labels,
+                               'tickvals': y_tick_values},
+                       xaxis2={'zeroline': False,
+                               'showgrid': False,
+                               'showticklabels': False,
+                               'domain': [0.93, 1.0],
+                               'range': y2_range},
+                       hovermode='closest',
+                       plot_bgcolor=PLOT_BACKGROUND_COLOR,
+                       #height=900,
+        margin={'t': 0, 'b': 0}
+                       )
+    return(layout, trace_depth_histogram)
+
+
+def get_growth_figure(position_data, order):
+    #figure that animates configs of the position as snapshots of a growing tree, see growth.py
+    #order: config indices in ladder order, see TreeData.get_ladder_order
+    #nodes are drawn in traces per group (first config that has them), frame k only sets visibility of
+    #the groups, principal variation and histogram of nodes per depth to those of config order[k]
+    G_merged = position_data.merged_graph
+    data = position_data.data
+    visible = data['visible'][order]
+    final = order[-1]
+    drawn = None
+    all_nodes = visible.any(axis=0)
+    if all_nodes.sum() > GROWTH_NODE_LIMIT:
+        drawn, _ = get_lod_nodes(G_merged, G_merged.N, all_nodes, data['pv'][final], GROWTH_NODE_LIMIT)
+    groups = get_growth_groups(visible, drawn)
+    types = get_growth_types(data['type'][order], visible)
+    nr_of_nodes = sum(len(group) for group in groups)
+    compact = nr_of_nodes >= NODE_LIMIT_FOR_COMPACT_PAYLOAD
+    #hover texts of all nodes would make the figure of large trees several times bigger
+    with_hover = nr_of_nodes <= LOD_NODE_LIMIT
+    scatter = go.Scattergl if nr_of_nodes >= NODE_LIMIT_FOR_WEBGL else go.Scatter
+    x, y = data['x'], data['y']
+    if compact:
+        x = quantize(x)
+
+    def pv_edges(config):
+        x_edges, y_edges = get_edges(x, y, data['parent'], np.flatnonzero(data['pv'][config]))
+        return({'x': x_edges.tolist(), 'y': edge_depths_to_payload(y_edges, compact)})
+
+    #edges of all groups first, so that nodes are drawn over them
+    traces, trace_arrays, trace_groups = [], [], []
+    for group_index, group in enumerate(groups):
+        x_edges, y_edges = get_edges(x, y, data['parent'], group)
+        traces.append(scatter(mode='lines', line=dict(color=EDGE_COLOR, width=0.5), showlegend=False,
+                              hoverinfo='skip'))
+        trace_arrays.append({'x': x_edges.tolist(), 'y': edge_depths_to_payload(y_edges, compact)})
+        trace_groups.append(group_index)
+    traces.append(scatter(mode='lines', line=dict(color=PV_COLOR, width=1.75), showlegend=False, hoverinfo='skip'))
+    trace_arrays.append(pv_edges(final))
+    trace_groups.append(0)
+    pv_trace = len(traces) - 1
+    for group_index, group in enumerate(groups):
+        for type, color in ((ODD_TYPE, BRANCH_COLORS[1]), (EVEN_TYPE, BRANCH_COLORS[0]), (ROOT_TYPE, ROOT_NODE_COLOR)):
+            ids = group[types[group] == type]
+            if type == ROOT_TYPE and len(ids) == 0:
+                continue
+            arrays = {'x': x[ids].tolist(), 'y': y[ids].tolist()}
+            if with_hover: #metrics of the config the nodes first appear in
+                arrays['customdata'], template = get_hover_data(data, G_merged, order[group_index], ids)
+            traces.append(scatter(mode='markers', marker={'color': color, 'symbol': "circle", 'size': MARKER_SIZE},
+                                  hovertemplate=template if with_hover else None,
+                                  hoverinfo=None if with_hover else 'skip',
+                                  hoverlabel=dict(font=dict(family=MONO_FONT_FAMILY, size=HOVER_FONT_SIZE),
+                                                  bgcolor=HOVER_LABEL_COLOR),
+                                  showlegend=False))
+            trace_arrays.append(arrays)
+            trace_groups.append(group_index)
+
+    layout, trace_depth_histogram = get_layout(position_data, final)
+    y_tick_labels = position_data.y_tick_labels
+    nr_of_traces = len(traces)
+    frames = []
+    steps = []
+    for step, config in enumerate(order):
+        x_hist, y_hist = position_data.data_depth[config]
+        frame_data = [{'visible': group_index <= step} for group_index in trace_groups]
+        frame_data[pv_trace] = dict(pv_edges(config), visible=True)
+        frame_data.append({'x': y_hist, 'y': x_hist})
+        frames.append({'name': str(step),
+                       'data': frame_data,
+                       'traces': list(range(nr_of_traces + 1)),
+                       'layout': {'xaxis': {'ticktext': position_data.x_tick_labels[config]},
+                                  'yaxis2': {'ticktext': get_depth_tick_labels(y_hist, y_tick_labels)}}})
+        steps.append({'label': str(int(visible[config].sum())),
+                      'method': 'animate',
+                      'args': [[str(step)], {'mode': 'immediate', 'frame': {'duration': 0, 'redraw': True},
+                                               'transition': {'duration': 0}}]})
+    layout.update(margin={'t': GROWTH_CONTROLS_MARGIN, 'b': 0},
+                  updatemenus=[{'type': 'buttons', 'direction': 'left', 'showactive': False,
+                                'x': 0, 'xanchor': 'left', 'y': 1, 'yanchor': 'bottom', 'pad': {'b': 10},
+                                'buttons': [{'label': 'Play', 'method': 'animate',
+                                             'args': [None, {'frame': {'duration': GROWTH_FRAME_DURATION,
+                                                                       'redraw': True},
+                                                             'transition': {'duration': 0}, 'fromcurrent': False}]},
+                                            {'label': 'Pause', 'method': 'animate',
+                                             'args': [[None], {'mode': 'immediate',
+                                                               'frame': {'duration': 0, 'redraw': False}}]}]}],
+                  sliders=[{'active': len(order) - 1, 'steps': steps, 'x': 0.12, 'len': 0.79, 'y': 1, 'yanchor': 'bottom',
+                            'pad': {'t': 0, 'b': 10}, 'currentvalue': {'prefix': 'Nodes: '}}])
+    figure = subplots.make_subplots(rows=1, cols=2,
+                                    specs=[[{}, {}]],
+                                    shared_xaxes=True,
+                                    shared_yaxes=False,
+                                    vertical_spacing=0.001)
+    for trace in traces:
+        figure.append_trace(trace, 1, 1)
+    figure.append_trace(trace_depth_histogram, 1, 2)
+    figure['layout'].update(layout)
+    #point arrays are added after validation like in update_data
+    figure = figure.to_plotly_json()
+    for trace, arrays in zip(figure['data'], trace_arrays):
+        trace.update(arrays)
+    figure['frames'] = frames
+    return(figure, nr_of_nodes)
+
 
 @app.callback(
     [Output('graph', 'figure'),
-     Output('config_info', 'children')],
+     Output('config_info', 'children'),
+     Output('graph-viewport', 'data')],
     [Input('slider1', 'value'),
      Input('move-table', 'active_cell'),
      Input('net-mode-selector', 'value'),
-     Input('config-table-dummy-div', 'children')],
+     Input('config-table-dummy-div', 'children'),
+     Input('graph', 'relayoutData'),
+     Input('growth-mode-selector', 'value')],
     [State('net_selector', 'value'),
-     State('position-mode-selector', 'value')]
+     State('position-mode-selector', 'value'),
+     State('graph-viewport', 'data')]
 )
-def update_data(selected_value, active_cell, net_mode, config_changed, global_net, position_mode):
+def update_data(selected_value, active_cell, net_mode, config_changed, relayout_data, growth_mode, global_net,
+                position_mode, viewport_store):
     if position_mode == 'pgn':
         tree_data = tree_data_pgn
         game_data = game_data_pgn
@@ -272,75 +694,106 @@ def update_data(selected_value, active_cell, net_mode, config_changed, global_ne
     tooltip = ', '.join([f'{option}={configurations[option]}' for option in configurations])
 
     if active_cell is None or game_data.data is None:
-        return (empty_figure(), tooltip)
+        return (empty_figure(), tooltip, dash.no_update)
     else:
         position_id = active_cell['row']
         position_id = game_data.data[position_id]['ply']
 
     #Show empty graph if position is not yet analyzed
-    if position_id not in tree_data.data:
-        return(empty_figure(), tooltip)
-    data = tree_data.data[position_id]
-    x_odd, y_odd, node_text_odd, node_ids_odd,\
-    x_even, y_even, node_text_even, node_ids_even,\
-    x_root, y_root, node_text_root, node_ids_root,\
-    x_edges, y_edges, x_edges_pv, y_edges_pv = get_data(data, selected_value)
-
-    #if there is no root node, then slider is set to value that has not been analyzed yet
-    if x_root == []:
-        return(empty_figure(), tooltip)
-
-    if len(x_odd) + len(x_even) + 1 >= NODE_LIMIT_FOR_WEBGL:
+    #position data is taken once, analysis running in background may install a new build meanwhile
+    position_data = tree_data.position_data.get(position_id)
+    if position_data is None:
+        return(empty_figure(), tooltip, dash.no_update)
+    data = position_data.data
+    triggerers = dash.callback_context.triggered
+
+    #growth animation shows all configs of the position, zooming doesn't redraw it
+    #only configs that were searched as one budget ladder are snapshots of one growing tree
+    ladder_order = tree_data.get_ladder_order(position_id) if growth_mode else None
+    if ladder_order is not None and len(ladder_order) == data.number_of_configs():
+        if any(triggerer['prop_id'] == 'graph.relayoutData' for triggerer in triggerers):
+            return(dash.no_update, dash.no_update, dash.no_update)
+        figure_key = (position_mode, position_id, 'growth')
+        figure = figure_cache.get(figure_key, data)
+        if figure is None:
+            figure, nr_of_nodes = get_growth_figure(position_data, ladder_order)
+            figure_cache.put(figure_key, data, figure, nr_of_nodes)
+        return(figure, tooltip, dash.no_update)
+    if growth_mode:
+        tooltip = 'Growth animation needs all configs searched as one budget ladder. ' + tooltip
+
+    #zooming redraws only trees that are drawn with collapsed subtrees or as an image, zoomed area is kept while
+    #configs of the same position are browsed
+    nr_of_nodes = data['visible'][selected_value].sum() if selected_value < data.number_of_configs() else 0
+    is_lod = nr_of_nodes > LOD_NODE_LIMIT
+    is_raster = RASTER_AVAILABLE and nr_of_nodes > RASTER_NODE_LIMIT
+    #zoomed area is kept by each browser tab in the graph-viewport store and dropped when another position is shown
+    position_key = (position_mode, position_id)
+    new_viewport_store = dash.no_update
+    if viewport_store is not None and viewport_store['key'] != list(position_key):
+        viewport_store = new_viewport_store = None
+    if any(triggerer['prop_id'] == 'graph.relayoutData' for triggerer in triggerers) and relayout_data:
+        viewport = get_viewport(relayout_data)
+        if viewport is dash.no_update:
+            return(dash.no_update, dash.no_update, new_viewport_store)
+        viewport_store = new_viewport_store = viewport_to_store(position_key, viewport)
+        if not is_lod:
+            return(dash.no_update, dash.no_update, new_viewport_store)
+    viewport = viewport_from_store(viewport_store)
+    figure_key = (position_mode, position_id, selected_value, tooltip, viewport)
+    figure = figure_cache.get(figure_key, data)
+    if figure is not None:
+        return(figure, tooltip, new_viewport_store)
+    G_merged = position_data.merged_graph
+    if is_raster:
+        plot_data, image = get_raster_data((position_mode, position_id), data, G_merged, selected_value,
+                                           position_data.x_range, position_data.y_range, viewport)
+    else:
+        plot_data, image = get_data((position_mode, position_id), data, G_merged, selected_value, viewport), None
+    x_odd, y_odd, customdata_odd, template_odd,\
+    x_even, y_even, customdata_even, template_even,\
+    x_root, y_root, customdata_root, template_root,\
+    x_collapsed, y_collapsed, customdata_collapsed, template_collapsed,\
+    x_edges, y_edges, x_edges_pv, y_edges_pv = plot_data
+
+    #slider is set to value that has not been analyzed yet
+    if selected_value >= data.number_of_configs():
+        return(empty_figure(), tooltip, new_viewport_store)
+
+    if len(x_odd) + len(x_even) + len(x_collapsed) + 1 >= NODE_LIMIT_FOR_WEBGL:
         scatter = go.Scattergl#go.Scattergl #go.Scatter
     else:
         scatter = go.Scatter
-    trace_node_odd = scatter(x=x_odd,
-                             y=y_odd,
-                             mode='markers',
+    trace_node_odd = scatter(mode='markers',
                              marker={'color': BRANCH_COLORS[1], 'symbol': "circle", 'size': MARKER_SIZE},
-                             customdata=node_ids_odd,
-                             #text=node_text_odd,
-                             hovertext=node_text_odd,
-                             hoverinfo='text',
+                             hovertemplate=template_odd,
                              textfont={"family": MONO_FONT_FAMILY},
                              hoverlabel=dict(font=dict(family=MONO_FONT_FAMILY, size=HOVER_FONT_SIZE), bgcolor=HOVER_LABEL_COLOR),
                              showlegend=False
                              )
-    trace_node_even = scatter(x=x_even,
-                              y=y_even,
-                              mode='markers',
+    trace_node_even = scatter(mode='markers',
                               marker={'color': BRANCH_COLORS[0], 'symbol': "circle", 'size': MARKER_SIZE},
-                              customdata=node_ids_even,
-                              hovertext=node_text_even,
-                              hoverinfo='text',
+                              hovertemplate=template_even,
                               textfont={"family": MONO_FONT_FAMILY},
                               hoverlabel=dict(font=dict(family=MONO_FONT_FAMILY, size=HOVER_FONT_SIZE), bgcolor=HOVER_LABEL_COLOR),
                               showlegend=False
                               )
 
-    trace_node_root = scatter(x=x_root,
-                              y=y_root,
-                              mode='markers',
+    trace_node_root = scatter(mode='markers',
                               marker={'color': ROOT_NODE_COLOR, 'symbol': "circle", 'size': MARKER_SIZE},
-                              customdata=node_ids_root,
-                              hovertext=node_text_root,
-                              hoverinfo='text',
+                              hovertemplate=template_root,
                               textfont={"family": MONO_FONT_FAMILY},
                               hoverlabel=dict(font=dict(family=MONO_FONT_FAMILY, size=HOVER_FONT_SIZE), bgcolor=HOVER_LABEL_COLOR),
                               showlegend=False
                               )
 
-    trace_edge = scatter(x=x_edges,
-                         y=y_edges,
-                         mode='lines',
+    trace_edge = scatter(mode='lines',
                          line=dict(color=EDGE_COLOR, width=0.5),
                          showlegend=False,
                          hoverinfo='skip'
                          )
 
-    trace_edge_pv = scatter(x=x_edges_pv,
-                            y=y_edges_pv,
-                            mode='lines',
+    trace_edge_pv = scatter(mode='lines',
                             line=dict(color=PV_COLOR, width=1.75),
                             showlegend=False,
                             hoverinfo='skip'
@@ -351,71 +804,26 @@ def update_data(selected_value, active_cell, net_mode, config_changed, global_ne
               trace_node_odd,
               trace_node_even,
               trace_node_root]
+    trace_arrays = [{'x': x_edges, 'y': y_edges},
+                    {'x': x_edges_pv, 'y': y_edges_pv},
+                    {'x': x_odd, 'y': y_odd, 'customdata': customdata_odd},
+                    {'x': x_even, 'y': y_even, 'customdata': customdata_even},
+                    {'x': x_root, 'y': y_root, 'customdata': customdata_root}]
+    if len(x_collapsed) > 0:
+        trace_node_collapsed = scatter(mode='markers',
+                                       marker={'color': COLLAPSED_NODE_COLOR, 'symbol': "triangle-down",
+                                               'size': 2 * MARKER_SIZE},
+                                       hovertemplate=template_collapsed,
+                                       textfont={"family": MONO_FONT_FAMILY},
+                                       hoverlabel=dict(font=dict(family=MONO_FONT_FAMILY, size=HOVER_FONT_SIZE),
+                                                       bgcolor=HOVER_LABEL_COLOR),
+                                       showlegend=False
+                                       )
+        traces.insert(4, trace_node_collapsed)
+        trace_arrays.insert(4, {'x': x_collapsed, 'y': y_collapsed, 'customdata': customdata_collapsed})
+
+    layout, trace_depth_histogram = get_layout(position_data, selected_value)
 
-    x_hist, y_hist = tree_data.data_depth[position_id][selected_value]
-
-    trace_depth_histogram = go.Bar(x=y_hist, y=x_hist, orientation='h',
-                                   showlegend=False, hoverinfo='skip',
-                                   marker=dict(color=BAR_COLOR))
-
-    x_range = tree_data.x_range[position_id]
-    y_range = tree_data.y_range[position_id]
-    y_tick_values = tree_data.y_tick_values[position_id]
-    y_tick_labels = tree_data.y_tick_labels[position_id]
-
-    #pad labels for nice alignment
-    y_hist_labels = ['0' for _ in range(len(y_tick_labels) - len(y_hist))] + list(map(str, y_hist))
-    max_y2_label_len = max(map(len, y_hist_labels))
-    y2_tick_labels = [label.rjust(max_y2_label_len, ' ') for label in y_hist_labels]
-
-    y2_range = tree_data.y2_range[position_id]
-    x_tick_labels = tree_data.x_tick_labels[position_id][selected_value]
-    x_tick_values = tree_data.x_tick_values[position_id]
-
-
-    layout = go.Layout(#title=dict(text='Leela tree Visualization', x=0.5, xanchor="center"),
-                       annotations=[
-                                    dict(
-                                        x=1.025,
-                                        y=0.5,
-                                        showarrow=False,
-                                        text='Nodes per depth',
-                                        xref='paper',
-                                        yref='paper',
-                                        textangle=90,
-                                        font=dict(family=MONO_FONT_FAMILY, size=RIGHT_TITLE_SIZE, color=FONT_COLOR)
-                                    ),
-                                ],
-                       xaxis={'title': 'Visit distribution',
-                              'range': x_range,
-                              'zeroline': False,
-                              'showgrid': False,
-                              'domain': [0.0, 0.91],
-                              'tickvals': x_tick_values,
-                              'ticktext': x_tick_labels},
-                       yaxis={'title': 'Depth',
-                              'range': y_range,
-                              'ticktext': y_tick_labels,
-                              'tickvals': y_tick_values,
-                              'zeroline': False,
-                              'showgrid': True,
-                              'gridcolor': GRID_COLOR},
-                       yaxis2={'title': '',
-                               'range': y_range,
-                               'showticklabels': True,
-                               'side': 'left',
-                               'ticktext': y2_tick_labels,
-                               'tickvals': y_tick_values},
-                       xaxis2={'zeroline': False,
-                               'showgrid': False,
-                               'showticklabels': False,
-                               'domain': [0.93, 1.0],
-                               'range': y2_range},
-                       hovermode='closest',
-                       plot_bgcolor=PLOT_BACKGROUND_COLOR,
-                       #height=900,
-        margin={'t': 0, 'b': 0}
-                       )
     figure = subplots.make_subplots(rows=1, cols=2,
                                     specs=[[{}, {}]],
                                     shared_xaxes=True,
@@ -426,8 +834,19 @@ def update_data(selected_value, active_cell, net_mode, config_changed, global_ne
 
     figure.append_trace(trace_depth_histogram, 1, 2)
     figure['layout'].update(layout)
-
-    return(figure, tooltip)
+    if is_lod:
+        #keep user's zoom when the figure is redrawn with more detail
+        figure['layout'].update(uirevision=f'{position_mode}-{position_id}')
+    #point arrays are added to the figure after plotly has validated it,
+    #validating them element by element would take most of the time for large trees
+    figure = figure.to_plotly_json()
+    for trace, arrays in zip(figure['data'], trace_arrays):
+        trace.update(arrays)
+    if image is not None:
+        figure['layout']['images'] = [image]
+    figure_cache.put(figure_key, data, figure, len(x_odd) + len(x_even) + len(x_collapsed) + 1)
+
+    return(figure, tooltip, new_viewport_store)
 
 @app.callback(
     Output('hidden-div-slider-state', 'children'),
@@ -452,13 +871,10 @@ def update_game_evals(visible, title, position_mode):
 
     for row in game_data.data:
         position_id = row['ply']
-        if position_id not in tree_data.data: #position not yet evaluated
-            Q, W, D, L, M = None, None, None, None, None
-        elif visible not in tree_data.data[position_id]['root']['visible']: #engine config set not yet evaluated
+        evaluation = tree_data.get_root_eval(position_id, visible)
+        if evaluation is None: #position or engine config set not yet evaluated
             Q, W, D, L, M = None, None, None, None, None
         else:
-            root = tree_data.data[position_id]['root']
-            evaluation = root['visible'][visible]['eval']
             Q = evaluation['Q']
             W = evaluation['W']
             D = evaluation['D']
@@ -1,25 +1,47 @@
+import numpy as np
 import networkx as nx
-from networkx.algorithms.dag import topological_sort
-import time
+from searchtree import SearchTree, child_offsets_from_parent
+
+#helpers below work both for networkx DiGraphs and compact SearchTrees
 
 def get_root(G):
+    if isinstance(G, SearchTree):
+        return(G.root)
     for n in G:
         if G.in_degree(n) == 0:
             return(n)
 
 def is_root(G, n):
+    if isinstance(G, SearchTree):
+        return(n == G.root)
     return(G.in_degree(n) == 0)
 
 def is_leaf(G, n):
     return(G.out_degree(n)==0)
         
 def get_children(G, n):
+    if isinstance(G, SearchTree):
+        return(G.get_children(n))
     return(G.successors(n))
 
 def get_parent(G, n):
+    if isinstance(G, SearchTree):
+        return(G.get_parent(n))
     # Only one predecessor as we are dealing with trees
     return(next(G.predecessors(n), None))
 
+def get_attributes(G, n):
+    #node attributes (move, N, Q, P, D, M) as dict
+    if isinstance(G, SearchTree):
+        return(G.get_attributes(n))
+    return(G.nodes[n])
+
+def as_digraph(G):
+    #for the parts that still need networkx algorithms
+    if isinstance(G, SearchTree):
+        return(G.to_digraph())
+    return(G)
+
 #def get_parent(G, n):
 #    if is_root(G, n):
 #        return(None)
@@ -28,6 +50,7 @@ def get_parent(G, n):
 
 def get_subtree_node_count(G, n):
     #number of nodes in this subbranch
+    G = as_digraph(G)
     visits = 1+len(nx.algorithms.dag.descendants(G,n))
     return(visits)
 
@@ -39,12 +62,12 @@ def calc_branching_factor_and_leaf_share(G):
     return(branching_factor, leaf_share)
 
 def get_nodes_in_depth(G):
-    root = get_root(G)
-    distances = [nx.shortest_path_length(G, root, n) for n in G]
-    l = list(set(distances))
-    l.sort()
-    counts = [str(distances.count(x)) for x in l][::-1]
-    return(counts)
+    #number of nodes on each depth as ints, deepest first
+    if isinstance(G, SearchTree):
+        return(G.get_depth_counts()[::-1].tolist())
+    distances = nx.single_source_shortest_path_length(G, get_root(G))
+    counts = np.bincount(list(distances.values()))
+    return(counts[::-1].tolist())
 
 #maybe useful someday
 def number_of_shared_nodes(G1,G2):
@@ -58,94 +81,146 @@ def calc_leaf_portion(G):
 
 def get_moves(G, n):
     moves = []
-    move = G.nodes[n]['move']
+    move = get_attributes(G, n)['move']
     while move != "":
         moves.append(move)
         n = get_parent(G, n)
-        move = G.nodes[n]['move']
+        move = get_attributes(G, n)['move']
     return(moves[::-1])
 
-def unify_ids(G, label_dict, running_id):
-    new_ids = {}
-    node_move_chain = {}
-    for n in topological_sort(G):
-        parent = get_parent(G, n)
-        if parent is None:
-            chain = ''
-        else:
-            chain = node_move_chain[parent] + G.nodes[n]['move']
-
-        node_move_chain[n] = chain
-        id = label_dict.get(chain, None)
-        if id is None:
-            id = running_id
-            running_id += 1
-            label_dict[chain] = id
-        new_ids[n] = id
-    #print('IDs',new_ids)
-    G = nx.relabel_nodes(G, new_ids, copy=True)
-    return(G, label_dict, running_id)
-
-def merge_graphs(G_list):
-    #takes list of DiGraphs and calculates union of the graphs
-    #also unifies the node ids of each graph so that nodes obtained from same move sequence have same id
-
-    start = time.time()
-    label_dict = {"": "root"}
-    running_id = 0
-    G_merged = nx.DiGraph()
-
-    G_list_new = []
-
-    for G in G_list:
-        G, label_dict, running_id = unify_ids(G, label_dict, running_id)
-        G_list_new.append(G)
-    G_list = G_list_new
-
-    G_merged.add_node(get_root(G_list[0]))  # add root node to handle case of no edges
-
-    #print('Merging - relabel', time.time() - start)
-    start = time.time()
-
-    moves = {'root': None}
-    for G in G_list:
-        for edge in G.edges():
-            if edge not in G_merged.edges():
-                G_merged.add_edge(edge[0], edge[1])
-
-                node = edge[1]
-                if node not in moves:
-                    moves[node] = G.nodes[node]['move']
-    #print('Merging - 1st merged', time.time() - start)
-    start = time.time()
-    for n in topological_sort(G_merged.reverse()):
-        parent = get_parent(G_merged, n)
-        if parent is None:
-            if 'N' not in G_merged.nodes[n]: #this happens only if tree contains exactly 1 node
-                G_merged.nodes[n]['N'] = 1
+def merge_trees(trees):
+    #union of search trees, nodes obtained from same move sequence get the same merged id
+    #works like a trie keyed by (parent merged id, move): all trees are processed together one depth
+    #at a time and keys of the depth are resolved with a single np.unique instead of a dict lookup per node
+    #merged ids are given in breadth first order, children ordered by first appearance, so that the
+    #merged tree is a SearchTree itself
+    #returns merged tree, merged id of each row for each tree and membership mask (tree, merged id)
+    key_base = np.int64(np.iinfo(np.uint16).max + 1) #move codes are int16
+    merged_ids = [np.zeros(len(tree), dtype=np.int32) for tree in trees]
+    levels = [tree.levels() for tree in trees]
+    bounds = [next(level) for level in levels] #every tree has root
+    parent = [np.array([-1], dtype=np.int64)]
+    move_codes = [np.zeros(1, dtype=np.int16)]
+    level_starts = [0]
+    nr_of_nodes = 1
+    while True:
+        bounds = [next(level, (end, end)) for level, (_, end) in zip(levels, bounds)]
+        keys = [merged_ids[i][tree.parent[start:end]].astype(np.int64) * key_base + tree.move_codes[start:end]
+                for i, (tree, (start, end)) in enumerate(zip(trees, bounds))]
+        keys = np.concatenate(keys)
+        if len(keys) == 0:
             break
-        if 'N' not in G_merged.nodes[n]:
-            G_merged.nodes[n]['N'] = 1
-        if 'N' not in G_merged.nodes[parent]:
-            G_merged.nodes[parent]['N'] = 1 + G_merged.nodes[n]['N']
+        unique_keys, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+        unique_parents = unique_keys // key_base
+        order = np.lexsort((first, unique_parents))
+        new_ids = np.empty(len(unique_keys), dtype=np.int32)
+        new_ids[order] = nr_of_nodes + np.arange(len(unique_keys))
+        new_ids = new_ids[inverse.ravel()]
+        offset = 0
+        for ids, (start, end) in zip(merged_ids, bounds):
+            ids[start:end] = new_ids[offset:offset + end - start]
+            offset += end - start
+        parent.append(unique_parents[order])
+        move_codes.append((unique_keys % key_base)[order].astype(np.int16))
+        level_starts.append(nr_of_nodes)
+        nr_of_nodes += len(unique_keys)
+    parent = np.concatenate(parent).astype(np.int32)
+    move_codes = np.concatenate(move_codes)
+
+    #visits of merged node = number of nodes in its subtree, summed bottom-up one depth at a time
+    N = np.ones(nr_of_nodes, dtype=np.int64)
+    levels = list(zip(level_starts, level_starts[1:] + [nr_of_nodes]))
+    #parents of a depth are the rows of the previous depth
+    for (parent_start, parent_end), (start, end) in reversed(list(zip(levels, levels[1:]))):
+        N[parent_start:parent_end] += np.bincount(parent[start:end] - parent_start, weights=N[start:end],
+                                                  minlength=parent_end - parent_start).astype(np.int64)
+
+    membership = np.zeros((len(trees), nr_of_nodes), dtype=bool)
+    for i, ids in enumerate(merged_ids):
+        membership[i, ids] = True
+
+    merged = SearchTree(parent, child_offsets_from_parent(parent), move_codes, N)
+    return(merged, merged_ids, membership)
+
+def update_merged_tree(G_merged, merged_ids, membership, index, tree=None):
+    #merge_trees result with the tree of one config replaced, added (index equal to number of trees) or removed
+    #(tree is None), without merging the other trees again. Result is the same as merge_trees of the new trees
+    #nodes of the new tree are matched to merged nodes one depth at a time like in merge_trees, unmatched nodes get
+    #temporary ids after the old merged nodes. Merged ids are then given again in the order of merge_trees:
+    #breadth first, children ordered by the first config (and its row) that contains them
+    #returns merged tree, merged ids, membership and new merged id of each old merged node, -1 if it was removed
+    key_base = np.int64(np.iinfo(np.uint16).max + 1) #move codes are int16
+    nr_of_old = len(G_merged)
+    parent = [G_merged.parent.astype(np.int64)]
+    move_codes = [G_merged.move_codes]
+    depth = [G_merged.depth]
+    merged_ids = list(merged_ids)
+    nr_of_nodes = nr_of_old
+    if tree is not None:
+        old_keys = parent[0] * key_base + G_merged.move_codes
+        key_order = np.argsort(old_keys)
+        sorted_keys = old_keys[key_order]
+        ids = np.zeros(len(tree), dtype=np.int64)
+        for level, (start, end) in enumerate(tree.levels()):
+            if level == 0:
+                continue
+            keys = ids[tree.parent[start:end]] * key_base + tree.move_codes[start:end]
+            position = np.minimum(np.searchsorted(sorted_keys, keys), len(sorted_keys) - 1)
+            new = np.flatnonzero(sorted_keys[position] != keys)
+            new_keys, first, inverse = np.unique(keys[new], return_index=True, return_inverse=True)
+            level_ids = key_order[position]
+            level_ids[new] = nr_of_nodes + inverse.ravel()
+            ids[start:end] = level_ids
+            parent.append(ids[tree.parent[start:end][new[first]]])
+            move_codes.append(tree.move_codes[start:end][new[first]])
+            depth.append(np.full(len(new_keys), level, dtype=np.int32))
+            nr_of_nodes += len(new_keys)
+        if index == len(merged_ids):
+            merged_ids.append(ids)
         else:
-            G_merged.nodes[parent]['N'] += G_merged.nodes[n]['N']
-
-    visits_and_nodes = [(G_merged.nodes[node]['N'], node) for node in G_merged]
-    visits, nodes = zip(*sorted(visits_and_nodes, reverse=True))
-    #print('Merging - calc visits', time.time() - start)
-
-    #reconstruct by adding nodes in order of visit counts for prettier layout result from buchheim algorithm
-    # -> node heavy branches will be aligned left
-    start = time.time()
-    G_merged_ordered = nx.DiGraph()
-    for n in nodes:
-        G_merged_ordered.add_node(n,
-                                  N=G_merged.nodes[n]['N'], #visits is needed for layout sorting
-                                  move=moves[n]) #move is needed for heatmap graphs
-    for edge in G_merged.edges():
-        G_merged_ordered.add_edge(edge[0], edge[1])
-
-    #print('Merging - 2d merged', time.time() - start)
-        
-    return(G_merged_ordered, G_list)
+            merged_ids[index] = ids
+    else:
+        del merged_ids[index]
+    parent = np.concatenate(parent)
+    move_codes = np.concatenate(move_codes)
+    depth = np.concatenate(depth)
+
+    membership = np.zeros((len(merged_ids), nr_of_nodes), dtype=bool)
+    first_config = np.zeros(nr_of_nodes, dtype=np.int64)
+    first_row = np.zeros(nr_of_nodes, dtype=np.int64)
+    for i in reversed(range(len(merged_ids))):
+        membership[i, merged_ids[i]] = True
+        first_config[merged_ids[i]] = i
+        first_row[merged_ids[i][::-1]] = np.arange(len(merged_ids[i]))[::-1]
+    kept = membership.any(axis=0)
+
+    #visits (subtree sizes) change only on the paths from added and removed nodes to root
+    N = np.zeros(nr_of_nodes, dtype=np.int64)
+    N[:nr_of_old] = G_merged.N
+    changed = np.flatnonzero(kept[nr_of_old:]) + nr_of_old
+    removed = np.flatnonzero(~kept[:nr_of_old])
+    nodes = np.concatenate((changed, removed))
+    values = np.concatenate((np.ones(len(changed), dtype=np.int64), -np.ones(len(removed), dtype=np.int64)))
+    while len(nodes) > 0:
+        N[nodes] += values
+        nodes, inverse = np.unique(parent[nodes], return_inverse=True)
+        values = np.bincount(inverse.ravel(), weights=values).astype(np.int64)
+        affected = (nodes >= 0) & (values != 0)
+        nodes, values = nodes[affected], values[affected]
+
+    #merged ids in breadth first order, one depth at a time as parents' ids are needed for ordering children
+    nodes = np.flatnonzero(kept)
+    nodes = nodes[np.argsort(depth[nodes], kind='stable')]
+    level_ends = np.cumsum(np.bincount(depth[nodes]))
+    new_ids = np.full(nr_of_nodes, -1, dtype=np.int64)
+    new_ids[0] = 0
+    for start, end in zip(level_ends[:-1], level_ends[1:]):
+        level = nodes[start:end]
+        level = level[np.lexsort((first_row[level], first_config[level], new_ids[parent[level]]))]
+        new_ids[level] = np.arange(start, end)
+    nodes = nodes[np.argsort(new_ids[nodes])]
+
+    merged_parent = np.where(parent[nodes] >= 0, new_ids[np.maximum(parent[nodes], 0)], -1).astype(np.int32)
+    merged = SearchTree(merged_parent, child_offsets_from_parent(merged_parent), move_codes[nodes], N[nodes])
+    merged_ids = [new_ids[ids].astype(np.int32) for ids in merged_ids]
+    return(merged, merged_ids, membership[:, nodes], new_ids[:nr_of_old])
@@ -0,0 +1,36 @@
+import numpy as np
+
+#growth of a search tree over configs that are snapshots of one search at increasing node budgets
+#(see budget ladder of TreeData.start_searches), all snapshots are drawn on the common layout of the merged tree
+#config rows of visible and types are in ladder order (TreeData.get_ladder_order), so each config's tree
+#contains the trees of the configs before it
+#nodes are grouped by the first config that contains them, tree of config k is then the union of groups 0..k
+#so that an animation frame only has to switch visibility of the groups instead of sending the tree again
+
+
+def get_first_configs(visible):
+    #index of first config that contains each merged node, number of configs for nodes of no config
+    first = np.argmax(visible, axis=0)
+    return(np.where(visible.any(axis=0), first, len(visible)))
+
+
+def get_last_configs(visible):
+    #index of last config that contains each merged node, -1 for nodes of no config
+    last = len(visible) - 1 - np.argmax(visible[::-1], axis=0)
+    return(np.where(visible.any(axis=0), last, -1))
+
+
+def get_growth_groups(visible, drawn=None):
+    #node ids of each config's group in merged id order, drawn: mask of nodes to include, all if None
+    first = get_first_configs(visible)
+    if drawn is not None:
+        first = np.where(drawn, first, len(visible))
+    nodes = np.argsort(first, kind='stable').astype(np.int32)
+    bounds = np.searchsorted(first[nodes], np.arange(len(visible) + 1))
+    return([nodes[start:end] for start, end in zip(bounds[:-1], bounds[1:])])
+
+
+def get_growth_types(types, visible):
+    #node type of each merged node from the last config that contains it, so colors match the final tree
+    last = get_last_configs(visible)
+    return(types[np.maximum(last, 0), np.arange(types.shape[1])])
@@ -156,10 +156,10 @@ def update_depth_selector_max(active_cell, position_mode, selected_depths, curre
         tree_data = tree_data_fen
         game_data = game_data_fen
     position_id = game_data.get_position_id(active_cell['row'])
-    try:
-        new_max = max(tree_data.y_range[position_id])
-    except KeyError:
+    position_data = tree_data.position_data.get(position_id)
+    if position_data is None:
         return(dash.no_update, dash.no_update, dash.no_update)
+    new_max = max(position_data.y_range)
     marks = {i: str(i) if i % 2 == 0 else '' for i in range(new_max + 1)}
     if selected_max_depth == current_max or selected_max_depth > new_max:
         selected_max_depth = new_max
@@ -269,20 +269,9 @@ def update_heatmap(heatmap_type, position_mode, active_cell, active_tab, slider_
         game_data = game_data_fen
     selected_row = active_cell['row']
     position_id = game_data.get_position_id(selected_row)
-    #tree_data.calculate_heatmap_data(position_id)
-    if position_id in tree_data.G_dict:
-        try:
-            if heatmap_type in ('origin', 'destination'):
-                heatmap_data = tree_data.heatmap_data_for_moves[position_id][slider_value]
-            else:
-                heatmap_data = tree_data.heatmap_data_for_board_states[position_id][slider_value]
-        except KeyError:
-            print('generating heat map data')
-            tree_data.calculate_heatmap_data(position_id, heatmap_type)
-        if heatmap_type in ('origin', 'destination'):
-            heatmap_data = tree_data.heatmap_data_for_moves[position_id][slider_value]
-        else:
-            heatmap_data = tree_data.heatmap_data_for_board_states[position_id][slider_value]
+    position_data = tree_data.position_data.get(position_id)
+    if position_data is not None:
+        heatmap_data = tree_data.get_heatmap_data(position_id, position_data, heatmap_type)[slider_value]
     else:
         return(empty_figure(), move_counts_data(None, depth_filter_min, depth_filter_max))
 
@@ -1,23 +1,44 @@
 import chess.engine
 import time
-import networkx as nx
+from gml_reader import read_tree_gml
+from searchtree import SearchTree
 import os
+import tempfile
 from os.path import isfile, join
 from datetime import datetime
 from constants import ROOT_DIR
 
+def load_tree_dump(tree_file):
+    #parses and removes tree dump written by leela_engine.search
+    try:
+        g = SearchTree.from_columns(read_tree_gml(tree_file))
+    finally:
+        os.remove(tree_file)
+    return(g)
+
+class EngineLaunchError(Exception):
+    #lc0_tree engine or weights not found or engine process could not be started, see LcT_log.txt
+    pass
+
 class leela_engine:
     def __init__(self, engine_path=None):
         self.error = None
+        #private working directory of the engine process, lc0_tree dumps its search trees there
+        #so that several engines or LcT instances never overwrite each other's trees
+        self.work_dir = tempfile.TemporaryDirectory(prefix='lct_engine_')
         if engine_path is None:
             engine_path = self.find_engine()
-            net = self.find_net()
+        net = self.find_net()
+        #relative paths would be resolved against the engine's own working directory
+        self.engine_path = None if engine_path is None else os.path.abspath(engine_path)
+        self.net_path = None if net is None else os.path.abspath(net)
         if net is not None and engine_path is not None:
-            engine_path = [engine_path, '--weights=' + net]  # '--logfile=lc0_log.txt']
+            engine_path = [self.engine_path, '--weights=' + self.net_path]  # '--logfile=lc0_log.txt']
             try:
-                self.lc0 = chess.engine.SimpleEngine.popen_uci(engine_path)
+                self.lc0 = chess.engine.SimpleEngine.popen_uci(engine_path, cwd=self.work_dir.name)
             except:
-                self.error = f'{datetime.now()}: Could not launch lc0_tree engine with command "{"".join(engine_path)}"'
+                self.lc0 = None
+                self.error = f'{datetime.now()}: Could not launch lc0_tree engine with command "{" ".join(engine_path)}"'
         else:
             self.lc0 = None
             self.error = ''
@@ -25,14 +46,13 @@ class leela_engine:
                 self.error += f'{datetime.now()}: Could not find any weight files in "weights"-folder. Add at least one weight file. \n'
             if engine_path is None:
                 self.error += f'{datetime.now()}: Coult not find lc0_tree engine. Please refer to the installation guide in "https://github.com/jkormu/leela-tree-dash" \n'
-        log_file = join(ROOT_DIR, 'LcT_log.txt')
-        print(log_file)
         if self.error is not None:
             log_file = join(ROOT_DIR, 'LcT_log.txt')
-            print(log_file)
             with open(log_file, "w") as log:
                 log.write(self.error)
-        self.analyzed_count = 0 #used as unique id of position for SimpleEngine.play(), forces ucinewgame
+            self.work_dir.cleanup()
+            raise EngineLaunchError(self.error)
+        self.analyzed_count = 0 #used as unique id of game for SimpleEngine.play(), new game forces ucinewgame
         self.configuration = {}
         self.options = self.get_options()
         for opt in self.options:
@@ -60,22 +80,40 @@ class leela_engine:
         return(net_path)
 
     def play(self, board, nodes):
+        return(load_tree_dump(self.search(board, nodes)))
+
+    def search(self, board, nodes):
+        #like play, but returns path of the tree dump without parsing it
+        #the dump file is left for the caller, see load_tree_dump
+        return(self.search_ladder(board, [nodes])[0])
+
+    def search_ladder(self, board, budgets):
+        #searches the position with each node limit of budgets (increasing) in turn, returns paths of tree dumps
+        #all searches belong to the same game, so no ucinewgame is sent in between and lc0 continues from the
+        #tree of the previous search, only nodes above previous limit are searched as lc0 counts reused nodes
         self.analyzed_count += 1
-        start = time.time()
-        try:
-            self.lc0.play(board, chess.engine.Limit(nodes=nodes), game=self.analyzed_count)
-        except chess.engine.EngineError:#ValueError:
-            #we have hit terminal and lc0 responded "a1a1" as null move, python chess expects 0000
-            #we can safely carry on reading the tree file with just one node
-            pass
-        print('search completed in time: ', time.time() - start)
-        g = nx.readwrite.gml.read_gml('tree.gml', label='id')
-        os.remove('tree.gml')
-        return(g)
+        tree_files = []
+        for rung, nodes in enumerate(budgets):
+            start = time.time()
+            try:
+                self.lc0.play(board, chess.engine.Limit(nodes=nodes), game=self.analyzed_count)
+            except chess.engine.EngineError:#ValueError:
+                #we have hit terminal and lc0 responded "a1a1" as null move, python chess expects 0000
+                #we can safely carry on reading the tree file with just one node
+                pass
+            print('search completed in time: ', time.time() - start)
+            tree_files.append(self.take_tree_dump(rung))
+        return(tree_files)
 
-    def configure(self, options):
-        #change configuration only if new options differ from old
-        changed = False
+    def take_tree_dump(self, rung=0):
+        #lc0_tree always writes to tree.gml in its working directory,
+        #move the dump to a path of its own before the next search can overwrite it
+        tree_file = join(self.work_dir.name, f'tree_{self.analyzed_count}_{rung}.gml')
+        os.replace(join(self.work_dir.name, 'tree.gml'), tree_file)
+        return(tree_file)
+
+    def normalize_options(self, options):
+        #converts option values in place to the values that are actually sent to the engine
         boolean_conversion = {'False': False, 'True': True}
         for opt in options:
             # Need to convert boolean strings to booleans since
@@ -83,6 +121,9 @@ class leela_engine:
             if options[opt] in ['True', 'False']:
                 options[opt] = boolean_conversion[options[opt]]
 
+            if opt == 'WeightsFile' and isinstance(options[opt], str) and isfile(options[opt]):
+                options[opt] = os.path.abspath(options[opt])
+
             #clip the option value to allowed range
             min_ = self.options[opt].min
             max_ = self.options[opt].max
@@ -94,7 +135,13 @@ class leela_engine:
             #round interger options to nearest integer
             if self.options[opt].type == 'spin':
                 options[opt] = int(round(options[opt]))
+        return(options)
 
+    def configure(self, options):
+        #change configuration only if new options differ from old
+        changed = False
+        options = self.normalize_options(options)
+        for opt in options:
             if self.configuration[opt] != options[opt]:
                 self.configuration[opt] = options[opt]
                 changed = True
@@ -105,6 +152,7 @@ class leela_engine:
 
     def quit(self):
         self.lc0.quit()
+        self.work_dir.cleanup()
 
 
     def get_options(self):
@@ -0,0 +1,64 @@
+import numpy as np
+
+#level of detail selection for plotting huge trees
+#subtrees with few visits are collapsed into their root node, which is drawn as a summary glyph carrying the
+#visits of the whole subtree, so that the number of drawn nodes stays within a budget
+#nodes inside the zoomed viewport use a lower visit threshold than the rest, so zooming in expands detail
+
+
+def count_drawn(N, parents, threshold, forced, counted=None):
+    #number of drawn nodes with given (per node) visit threshold: expanded nodes and their collapsed children
+    #forced: mask of nodes that are expanded regardless of visits, counted: mask of nodes to count, all if None
+    expanded = (N >= threshold) | forced
+    collapsed = (N >= 0) & ~expanded & (parents >= 0) & expanded[np.maximum(parents, 0)]
+    drawn = expanded | collapsed
+    if counted is not None:
+        drawn &= counted
+    return(int(drawn.sum()))
+
+
+def find_threshold(N, parents, budget, forced, in_view=None, outside_threshold=None):
+    #smallest visit threshold that keeps drawn nodes within budget
+    #with in_view, the threshold of viewport nodes while other nodes keep outside_threshold,
+    #only viewport nodes count against the budget then
+    candidates = np.unique(N[N >= 0] if in_view is None else N[in_view])
+    if len(candidates) == 0:
+        return(outside_threshold)
+
+    def fits(t):
+        if in_view is None:
+            return(count_drawn(N, parents, t, forced) <= budget)
+        return(count_drawn(N, parents, np.where(in_view, t, outside_threshold), forced, in_view) <= budget)
+
+    #number of drawn nodes grows as the threshold gets lower
+    low, high = 0, len(candidates) - 1
+    if not fits(candidates[high]):
+        return(candidates[high])
+    while low < high:
+        middle = (low + high) // 2
+        if fits(candidates[middle]):
+            high = middle
+        else:
+            low = middle + 1
+    return(candidates[low])
+
+
+def get_lod_nodes(G_merged, N, visible_mask, pv_mask, budget, in_view=None):
+    #G_merged: merged tree, N: visits of the config's nodes, visible_mask: nodes of the config, pv_mask: nodes on pv
+    #budget: number of nodes to draw, in_view: mask of nodes in zoomed area of the plot or None
+    #returns (drawn, collapsed) masks over merged nodes, collapsed nodes are drawn as summary glyphs
+    N = np.where(visible_mask, N, -1)
+    parents = G_merged.parent
+    #root and principal variation are always expanded
+    forced = pv_mask & visible_mask
+    forced[G_merged.root] = True
+    threshold = find_threshold(N, parents, budget, forced)
+    if in_view is not None:
+        in_view = in_view & visible_mask
+        threshold = np.where(in_view, find_threshold(N, parents, budget, forced, in_view, threshold), threshold)
+    expanded = (N >= threshold) | forced
+    #expanded viewport nodes may have ancestors below the outside threshold, expand those too
+    for start, end in reversed(list(G_merged.levels())[1:]):
+        expanded[parents[start:end][expanded[start:end]]] = True
+    collapsed = visible_mask & ~expanded & (parents >= 0) & expanded[np.maximum(parents, 0)]
+    return(expanded | collapsed, collapsed)
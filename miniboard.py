@@ -42,23 +42,22 @@ def update_hover_board(hover_data, position_mode, active_cell, slider_value):
     position_id = game_data.get_position_id(row)
     if position_id is None:
         return(None, None)
-    try:
-        data = tree_data.data[position_id]
-    except: #when user has clicked node to set position, hover board callback may trigger while the selected position has already been changed
+    position_data = tree_data.position_data.get(position_id)
+    if position_data is None: #when user has clicked node to set position, hover board callback may trigger while the selected position has already been changed
         return(None, None)
     try:
-        node_id = hover_data['points'][0]['customdata']
+        node_id = hover_data['points'][0]['customdata'][0]
     except KeyError: #we are not hovering over tree node but on bar chart element
         return(None, None)
 
-    moves = pt.get_moves(tree_data.G_dict[position_id][slider_value], node_id)
+    moves = pt.get_moves(position_data.merged_graph, node_id)
     board = chess.Board()
     start_fen = game_data.get_value_by_position_id('fen', position_id)
     board = pt.set_board(moves, board, start_fen)
 
-    move = data[node_id]['move']
+    move = position_data.merged_graph.get_move(node_id)
 
-    if move is not None:
+    if move != '':
         last_move = chess.Move.from_uci(move)
     else:
         last_move = None
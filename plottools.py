@@ -1,129 +1,53 @@
 from graphtools import *
-from buchheim import buchheim
+from buchheim import buchheim_layout
 import time
-from networkx.algorithms.dag import descendants
+import numpy as np
 
 MOVED_PIECE_COLOR = 'rgb(210,105,30)'
 COLOR_START = '<a href="" style="color: ' + MOVED_PIECE_COLOR + '">'
 COLOR_END = '</a>'
 
 
-def extract_coordinates(tree, pos):
-    pos[tree.node][0] = tree.x
-    pos[tree.node][1] = -tree.y
-    for child in tree.children:
-        extract_coordinates(child, pos)
-
 #calculates node positions in canvas
-def get_tree_layout(G):
-    node = get_root(G)
-    pos = {n:[None, None] for n in G.nodes}
+def get_tree_layout(G, previous=None):
+    #returns positions and LayoutState for updating the layout later, previous as in buchheim_layout
     start = time.time()
-    tree = buchheim(G, node)
-    extract_coordinates(tree, pos)
+    x, depth, state = buchheim_layout(G, previous=previous, with_state=True)
+    y = -depth
     #normalize x,y coords to interval [0,1]
-    x_list,y_list = list(zip(*list(pos.values())))
-    max_x, max_y = max(x_list), max(y_list)
-    min_x, min_y = min(x_list), min(y_list)
+    max_x, max_y = x.max(), y.max()
+    min_x, min_y = x.min(), y.min()
     if min_x != max_x and min_y != max_y:
-        for n in pos:
-            x,y = pos[n]
-            pos[n] = ((x-min_x)/(max_x-min_x), (y-min_y)/(max_y-min_y))
+        x = (x-min_x)/(max_x-min_x)
+        y = (y-min_y)/(max_y-min_y)
+    pos = {n: (x_n, y_n) for n, (x_n, y_n) in enumerate(zip(x.tolist(), y.tolist()))}
     print('Layout algorithm excecuted in:', time.time() - start, 's')
-    return(pos)
+    return(pos, state)
 
 #set y-coordinates to integers
 def adjust_y(pos):
     y = [pos[k][1] for k in pos.keys()]
     set_y = list(set(y))
     set_y.sort()
+    rank = {y_value: i for i, y_value in enumerate(set_y)}
     for k in pos:
-        pos[k] = (pos[k][0],set_y.index(pos[k][1]))
+        pos[k] = (pos[k][0], rank[pos[k][1]])
     return(pos)
 
 
-def branch_separation(G, pos):
-    # separates node coordinates into branches for coloring purposes (adjacent branches use different colors)
-
-    # finds the ancestor node on depth 1, i.e. the first node of this branch
-    def get_branch(node):
-        if is_root(G, node):
-            return (node)
-
-        while not is_root(G, get_parent(G, node)):
-            node = get_parent(G, node)
-        return (node)
-
-    root = get_root(G)
-    root_children = list(get_children(G, root))
-   # print('root children', list(root_children))
-
-    branches = {child: {child: pos[child]} for child in root_children}
-    branches[root] = {root: pos[root]}
-
-    for child in root_children:
-        sub_tree = descendants(G, child)
-        for node in sub_tree:
-            #print(child, 'node', node)
-            branches[child][node] = pos[node]
-
-    #print('branches', branches)
-
-    branch_list = list(branches)
-    pos_list = [branches[b] for b in branch_list]
-
-    def sort_key(b):
-        node = get_branch(list(b)[0])
-        if is_root(G, node):
-            return (-9999999)
-        else:
-            return (b[node][0])
-
-    pos_list.sort(key=sort_key)
-    return (pos_list)
-
-#def branch_separation2(G, pos):
-    #separates node coordinates into branches for coloring purposes (adjacent branches use different colors)
-    
-    #finds the ancestor node on depth 1, i.e. the first node of this branch
-#    def get_branch(node):
-#        if is_root(G, node):
-#            return(node)
-#
-#        while not is_root(G, get_parent(G, node)):
-#            node = get_parent(G, node)
-#        return(node)
-#
-#    root = get_root(G)
-#    root_children = get_children(G, root)
-#    #print('root children', list(root_children))##
-
-#    branches = {child: {} for child in root_children}
-#    branches[root] = {}
-#
-#    #divide pos into branches
-#    for n in pos:
-#        branch = get_branch(n)
-#        branches[branch][n] = pos[n]
-#
-#    print('branches', branches)
-#
-#    branch_list = list(branches)
-#    pos_list = [branches[b] for b in branch_list]
-#
-#    def sort_key(b):
-#        node = get_branch(list(b)[0])
-#        if is_root(G, node):
-#            return(-9999999)
-#        else:
-#            return(b[node][0])
-#
-#    pos_list.sort(key = sort_key)
-#    return(pos_list)
+def get_branch_labels(G, x):
+    #branch index of each node for coloring purposes (adjacent branches use different colors)
+    #branches are numbered from left to right by x coordinate of their first node, root is branch 0
+    #returns branch index and parity (0 even, 1 odd) of each node
+    root_children = np.arange(G.child_offsets[G.root], G.child_offsets[G.root + 1])
+    child_index = np.zeros(len(G), dtype=np.int32)
+    child_index[root_children[np.argsort(x[root_children], kind='stable')]] = 1 + np.arange(len(root_children))
+    branch_index = child_index[G.branch]
+    return(branch_index, branch_index % 2)
 
 def get_move(G, n):
     #print('node', n)
-    move = G.nodes[n]['move']
+    move = get_attributes(G, n)['move']
     return(move)
 
 def get_moves(G, n):
@@ -172,12 +96,12 @@ def get_miniboard_unicode(G, node, board, init_moves):
     return(new_board)#, fen, moves[-1])
 
 def get_best_edge(G, edges):
-        node_counts = [int(G.nodes[e[1]]['N']) for e in edges]
+        node_counts = [int(get_attributes(G, e[1])['N']) for e in edges]
         if node_counts == []:
             return([None, None])
         maxN = max(node_counts)
-        edges = [e for e in edges if int(G.nodes[e[1]]['N']) == maxN]
-        edge = max(edges, key=lambda e: float(G.nodes[e[1]]['Q']))
+        edges = [e for e in edges if int(get_attributes(G, e[1])['N']) == maxN]
+        edge = max(edges, key=lambda e: float(get_attributes(G, e[1])['Q']))
         return(edge)
 
 #for Dash implementation
@@ -193,9 +117,10 @@ def get_WDL(q,d, precision = 5):
 
 #for Dash implementation
 def get_node_eval(G, node):
-    Q = float(G.nodes[node]['Q'])
-    D = G.nodes[node]['D'] if 'D' in G.nodes[node] else None
-    M = float(G.nodes[node]['M']) if 'M' in G.nodes[node] else None
+    attributes = get_attributes(G, node)
+    Q = float(attributes['Q'])
+    D = attributes['D'] if 'D' in attributes else None
+    M = float(attributes['M']) if 'M' in attributes else None
 
     #filp root Q
     Q = -Q
@@ -206,25 +131,26 @@ def get_node_eval(G, node):
 
 #for Dash implementation
 def get_node_metric_text(G, node, start_with_newrows):
+    attributes = get_attributes(G, node)
     t = ''
     if start_with_newrows:
         t += '\n \n'
-    t += 'Move: ' + G.nodes[node]['move'] + '\n'
-    t += 'N: ' + G.nodes[node]['N'] + '\n'
-    if node == 'root':
-        Q = str(-1.0*float(G.nodes[node]['Q']))
+    t += 'Move: ' + attributes['move'] + '\n'
+    t += 'N: ' + str(attributes['N']) + '\n'
+    if is_root(G, node):
+        Q = str(-1.0*float(attributes['Q']))
     else:
-        Q = G.nodes[node]['Q']
+        Q = str(attributes['Q'])
     t += 'Q: ' + Q + '\n'
     try:
-        t += 'D: ' + G.nodes[node]['D'] + '\n'
+        t += 'D: ' + str(attributes['D']) + '\n'
     except:
         pass
     try:
-        t += 'M: ' + G.nodes[node]['M'] + '\n'
+        t += 'M: ' + str(attributes['M']) + '\n'
     except:
         pass
-    t += 'P: ' + G.nodes[node]['P'] + '\n'
+    t += 'P: ' + str(attributes['P']) + '\n'
     t = t.replace('\n', '<br>')
     return(t)
 
@@ -233,7 +159,7 @@ def get_pv_nodes(G):
     node = get_root(G)
     i = 0
     pv_nodes = []
-    if len(G.edges()) == 0:
+    if G.number_of_edges() == 0:
         return(pv_nodes)
     while True:
         edges = G.out_edges(node)
@@ -0,0 +1,105 @@
+import collections
+import os
+import numpy as np
+
+try:
+    from multiprocessing import shared_memory, resource_tracker
+except ImportError: #python < 3.8, arrays are pickled instead
+    shared_memory = None
+
+#columnar plot data of one analyzed position
+#node columns are indexed by merged node id, config columns have shape (number of configs, number of nodes)
+#all columns are plain numpy arrays, so postprocess workers can put them into one shared memory block
+#that the app process maps without copying
+#
+#columns:
+#  x, y          node coordinates, y is depth level
+#  parent        merged id of parent, -1 for root, parent coordinates are x[parent], y[parent]
+#  order         node ids in the order nodes are drawn
+#  visible       config x node, True if node is in the config's tree
+#  type          config x node, NODE_TYPES code of the node in the config's tree
+#  pv            config x node, True if node is on the config's principal variation
+#  N, Q, P, D, M config x node, metrics of the node in the config's tree, nan (0 for N) if node is not in the tree
+#  layout_x, layout_mod, layout_thread, layout_thread_depth, layout_thread_mod
+#                buchheim.LayoutState of the merged tree, for updating the layout when a config's tree changes
+#  board, board_offsets
+#                only with SHOW_UNICODE_BOARD, miniboards of nodes as utf-8 bytes, miniboard of node i is
+#                board[board_offsets[i]:board_offsets[i+1]]
+
+NODE_TYPES = ('root', 'even', 'odd')
+ROOT_TYPE, EVEN_TYPE, ODD_TYPE = range(len(NODE_TYPES))
+
+#on windows a shared memory block is freed when its last handle closes, so the worker keeps its handles
+#of recently exported blocks open until the app process has had time to attach them
+_exported = collections.deque(maxlen=16)
+
+SharedArraysHandle = collections.namedtuple('SharedArraysHandle', ['name', 'layout'])
+
+
+def encode_texts(texts):
+    encoded = [text.encode('utf-8') for text in texts]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(e) for e in encoded], out=offsets[1:])
+    return(np.frombuffer(b''.join(encoded), dtype=np.uint8), offsets)
+
+
+class PositionArrays:
+    def __init__(self, columns, shm=None):
+        self.columns = columns
+        self.shm = shm #keeps shared memory mapped as long as the columns are in use
+
+    def __getitem__(self, key):
+        return(self.columns[key])
+
+    def number_of_configs(self):
+        return(self.columns['visible'].shape[0])
+
+    def get_boards(self, nodes):
+        #miniboard texts of nodes, empty strings if miniboards were not built
+        if 'board' not in self.columns:
+            return([''] * len(nodes))
+        board, offsets = self.columns['board'], self.columns['board_offsets']
+        return([board[offsets[n]:offsets[n + 1]].tobytes().decode('utf-8') for n in nodes])
+
+    def export(self):
+        #copies columns into a new shared memory block, returns handle for attach
+        #falls back to returning self (pickled by value) when shared memory is not available
+        if shared_memory is None:
+            return(self)
+        layout = []
+        size = 0
+        for key, column in self.columns.items():
+            column = np.ascontiguousarray(column)
+            size = -(-size // 8) * 8 #8 byte alignment
+            layout.append((key, column.dtype.str, column.shape, size))
+            size += column.nbytes
+        shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        for key, dtype, shape, offset in layout:
+            np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset)[...] = self.columns[key]
+        if os.name == 'nt':
+            _exported.append(shm)
+        else:
+            #the app process unlinks the block, don't let this process' resource tracker unlink it too
+            resource_tracker.unregister('/' + shm.name, 'shared_memory')
+            shm.close()
+        return(SharedArraysHandle(shm.name, layout))
+
+    @classmethod
+    def attach(cls, handle):
+        #maps columns exported by another process, returns the object itself if it was passed by value
+        if not isinstance(handle, SharedArraysHandle):
+            return(handle)
+        shm = shared_memory.SharedMemory(name=handle.name)
+        #mapping stays valid after unlink, memory is released when the mapping is closed
+        shm.unlink()
+        columns = {key: np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset)
+                   for key, dtype, shape, offset in handle.layout}
+        return(cls(columns, shm))
+
+    @staticmethod
+    def discard(handle):
+        #frees shared memory of an exported handle that will not be attached
+        if isinstance(handle, SharedArraysHandle):
+            shm = shared_memory.SharedMemory(name=handle.name)
+            shm.unlink()
+            shm.close()
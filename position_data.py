@@ -0,0 +1,181 @@
+import collections
+import time
+import chess
+import numpy as np
+import graphtools as gt
+import plottools as pt
+from buchheim import LayoutState
+from constants import SHOW_UNICODE_BOARD
+from position_arrays import PositionArrays, encode_texts, ROOT_TYPE, EVEN_TYPE, ODD_TYPE
+
+#post-processing of analyzed positions, kept free of engine and app state so that worker processes can import it
+
+BEST_MOVE_COLOR = 'rgb(178,34,34)'
+
+#everything TreeData keeps of one analyzed position, replaced as a whole when the position is built again
+PositionData = collections.namedtuple('PositionData', ['merged_graph', 'merged_ids', 'membership', 'x_range', 'y_range',
+                                                       'y_tick_labels', 'y_tick_values', 'y2_range', 'data_depth',
+                                                       'x_tick_labels', 'x_tick_values', 'root_evals', 'data'])
+
+
+#replicate behaviour of numpy's linspace
+def linspace(a, b, n):
+    if n == 0:
+        return([])
+    elif n < 2:
+        return [a]
+    diff = (b - a)/(n - 1)
+    return([diff * i + a  for i in range(n)])
+
+
+def get_layout_state(position_arrays):
+    return(LayoutState(*(position_arrays['layout_' + field] for field in LayoutState._fields)))
+
+
+def update_merge(G_list, previous):
+    #merge_trees result of G_list from the previous merge by replacing, adding and removing trees one at a time
+    #previous: (merged tree, merged ids, membership, LayoutState, indices of changed configs) of previous G_list
+    #returns merged tree, merged ids, membership and layout previous for get_tree_layout
+    G_old, merged_ids, membership, state, changed = previous
+    G_merged = G_old
+    new_ids = np.arange(len(G_old))
+    updates = [(index, None) for index in range(len(merged_ids) - 1, len(G_list) - 1, -1)]
+    updates += [(index, G_list[index]) for index in sorted(changed)]
+    for index, tree in updates:
+        G_merged, merged_ids, membership, update_ids = gt.update_merged_tree(G_merged, merged_ids, membership,
+                                                                             index, tree)
+        new_ids = np.where(new_ids >= 0, update_ids[np.maximum(new_ids, 0)], -1)
+    return(G_merged, merged_ids, membership, (G_old, state, new_ids))
+
+
+def build_position_data(G_list, moves, previous=None):
+    #merges search trees of all configs of one position and builds everything needed for plotting them
+    #pure function of the trees so that it can run in a worker process
+    #previous: see update_merge, given when only some configs changed since the position was built,
+    #subtrees that are the same as in the previous merged tree keep their layout
+    #returns PositionData
+    start = time.time()
+    board = chess.Board()
+    if previous is None:
+        G_merged, merged_ids, membership = gt.merge_trees(G_list)
+        layout_previous = None
+    else:
+        G_merged, merged_ids, membership, layout_previous = update_merge(G_list, previous)
+    #print('graphs merged in', time.time() - start)
+    start = time.time()
+    pos, layout_state = pt.get_tree_layout(G_merged, layout_previous)
+    pos = pt.adjust_y(pos)
+    merged_x = np.array([pos[n][0] for n in G_merged])
+    nr_of_nodes = len(G_merged)
+    types = np.zeros((len(G_list), nr_of_nodes), dtype=np.int8)
+    pv = np.zeros((len(G_list), nr_of_nodes), dtype=bool)
+    #metrics of each config's nodes, nan (0 for N) where node is not in config's tree
+    metrics = {key: np.full((len(G_list), nr_of_nodes), np.nan) for key in ('Q', 'P', 'D', 'M')}
+    metrics['N'] = np.zeros((len(G_list), nr_of_nodes), dtype=np.int64)
+    drawn = np.zeros(nr_of_nodes, dtype=bool)
+    order = []
+    root_evals = []
+    node_counts = []
+
+    root = gt.get_root(G_merged)  # X-label
+    root_children = list(gt.get_children(G_merged, root))  # X-label
+    root_children.sort(key=lambda n: pos[n][0])  # X-label
+    x_labels = []  # X-label
+    x_label_vals = linspace(0, 1, len(root_children))
+    move_names = [G_merged.get_move(child) for child in root_children]
+
+    for owner, G in enumerate(G_list):
+        ids = merged_ids[owner].tolist()
+        start  = time.time()
+        #########################
+        x_lab = []  # X-label
+        G_non_root_nodes = int(G.N[G.root]) - 1
+
+        # get best root child
+        root = gt.get_root(G)
+        edges = G.out_edges(root)
+        best_node = pt.get_best_edge(G, edges)[1]
+        best_move = None if best_node is None else G.get_move(best_node)
+        own_root_children = {ids[child]: child for child in G.get_children(root)}
+
+        for j, child in enumerate(root_children):  # X-label
+            if best_move == move_names[j]:
+                val = '<a href="" style="color: ' + BEST_MOVE_COLOR + '"> <b>' + move_names[j] + '</b>' + '<br>'
+            else:
+                val = '<b>' + move_names[j] + '</b>' + '<br>'
+            if membership[owner, child]:  # X-label
+                nodes = int(G.N[own_root_children[child]])
+                p = str(round(100 * nodes / G_non_root_nodes, 1)) + '%'
+
+                val += p  # X-label
+                if best_move == move_names[j]:
+                    val += '</a>'
+
+            x_lab.append(val)  # X-label
+        x_labels.append(x_lab)  # X-label
+        #########################
+        #print('x-axis stuff in', time.time() - start)
+        start = time.time()
+        branch_index, parity = pt.get_branch_labels(G, merged_x[merged_ids[owner]])
+        #print('branch labels', time.time() - start)
+        start = time.time()
+        node_counts.append(gt.get_nodes_in_depth(G))
+        #print('node depths', time.time() - start)
+
+        #node types and principal variation of this config
+        own_types = np.where(parity == 0, EVEN_TYPE, ODD_TYPE).astype(np.int8)
+        own_types[G.root] = ROOT_TYPE
+        types[owner, merged_ids[owner]] = own_types
+        pv[owner, merged_ids[owner][pt.get_pv_nodes(G)]] = True
+        root_evals.append(pt.get_node_eval(G, G.root))
+        for key, column in metrics.items():
+            if getattr(G, key) is not None:
+                column[owner, merged_ids[owner]] = getattr(G, key)
+
+        #nodes are drawn branch by branch from left to right, nodes of earlier configs first
+        own_order = merged_ids[owner][np.argsort(branch_index, kind='stable')]
+        own_order = own_order[~drawn[own_order]]
+        drawn[own_order] = True
+        order.append(own_order)
+    columns = {'x': merged_x,
+               'y': np.array([pos[n][1] for n in G_merged], dtype=np.int32),
+               'parent': G_merged.parent,
+               'order': np.concatenate(order).astype(np.int32),
+               'visible': membership,
+               'type': types,
+               'pv': pv}
+    columns.update(metrics)
+    columns.update(('layout_' + field, column) for field, column in zip(LayoutState._fields, layout_state))
+    if SHOW_UNICODE_BOARD:
+        start = time.time()
+        miniboards = [pt.get_miniboard_unicode(G_merged, n, board, moves).replace('\n', '<br>') for n in G_merged]
+        columns['board'], columns['board_offsets'] = encode_texts(miniboards)
+        #print('miniboards in', time.time() - start)
+    position_arrays = PositionArrays(columns)
+    y_tick_labels, y_tick_values = pt.get_y_ticks(pos)
+    y_range = [-1, len(y_tick_values)]
+    x_range = pt.get_x_range(pos)
+
+    max_len = max([len(nc) for nc in node_counts])
+    node_counts = [[0] * (max_len - len(nc)) + nc for nc in node_counts]
+    y2_max = max(max(nc) for nc in node_counts)
+    return(PositionData(merged_graph=G_merged,
+                        merged_ids=merged_ids,
+                        membership=membership,
+                        x_range=x_range,
+                        y_range=y_range,
+                        y_tick_labels=y_tick_labels,
+                        y_tick_values=y_tick_values,
+                        y2_range=[0, y2_max],
+                        data_depth={i: (list(range(len(node_count))), node_count)
+                                    for i, node_count in enumerate(node_counts)},
+                        x_tick_labels={i: x_label_list for i, x_label_list in enumerate(x_labels)},
+                        x_tick_values=x_label_vals,
+                        root_evals=root_evals,
+                        data=position_arrays))
+
+
+def build_shared_position_data(G_list, moves, previous=None):
+    #build_position_data for worker processes, plot arrays are returned in shared memory
+    position_data = build_position_data(G_list, moves, previous)
+    return(position_data._replace(data=position_data.data.export()))
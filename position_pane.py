@@ -271,6 +271,16 @@ def position_pane():
                            'marginTop': '8px', 'marginBottom': '5px'})],
     style={'display': 'flex', 'flexDirection': 'row'})
 
+    analysis_progress = html.Div(children=[
+        html.Div(id='analysis-progress',
+                 style={'flex': '1', 'fontSize': '12px', 'overflow': 'hidden', 'whiteSpace': 'nowrap'}),
+        html.Button('Cancel',
+                    id='cancel-analysis-button',
+                    title='Cancel running and queued analysis',
+                    style={'padding': '2px', 'paddingLeft': '5px', 'paddingRight': '5px'}),
+        dcc.Interval(id='analysis-progress-interval', interval=1000, disabled=True)],
+    style={'display': 'flex', 'flexDirection': 'row', 'alignItems': 'center', 'marginBottom': '5px'})
+
     data_table = dash_table.DataTable(
             id='move-table',
             columns=PGN_MODE_COLUMNS,
@@ -320,7 +330,7 @@ def position_pane():
     container_table = html.Div(html.Div(children=data_table, style={'borderLeft': f'1px solid {BAR_LINE_COLOR}', 'borderTop': f'1px solid {BAR_LINE_COLOR}'}),
     style={'flex': '1', 'overflow': 'auto', })
     container = html.Div(style={'height': '100%', 'width': COMPONENT_WIDTH, 'display': 'flex', 'flexDirection': 'column'})
-    content = [quit_btn, mode_selector, fen_input, arrow_settings, img, score_bar(), fen_text, pgn_info, buttons, container_table]
+    content = [quit_btn, mode_selector, fen_input, arrow_settings, img, score_bar(), fen_text, pgn_info, buttons, analysis_progress, container_table]
     container.children = content
     return(container)
 
@@ -618,7 +628,7 @@ def update_score_bar(value, active_cell, position_mode):
         game_data = game_data_fen
     style = {'width': '100%', 'height': '100%', 'position': 'absolute', 'left': 0, 'visibility': 'visible'}
 
-    if active_cell is None or game_data.data is None or game_data.get_position_id(active_cell['row']) not in tree_data.data:
+    if active_cell is None or game_data.data is None or game_data.get_position_id(active_cell['row']) not in tree_data.position_data:
         style['visibility'] = 'hidden'
         return(dash.no_update, style)
 
@@ -693,8 +703,8 @@ def add_fen(n_clicks_fen, n_clicks_startpos, click_data, fen, position_mode, act
         game_data = game_data_fen
         row = active_cell['row']
         position_id = game_data.get_position_id(row)
-        node_id = click_data['points'][0]['customdata']
-        moves = pt.get_moves(tree_data.G_dict[position_id][slider_value], node_id)
+        node_id = click_data['points'][0]['customdata'][0]
+        moves = pt.get_moves(tree_data.position_data[position_id].merged_graph, node_id)
         board = chess.Board()
         start_fen = game_data.get_value_by_position_id('fen', position_id)
         if click_mode == ['add-also-parents']: #add also positions of intermediate nodes between clicked and root node
@@ -750,16 +760,18 @@ def data_row_delete(data, position_mode):
     if data == []:
         game_data_fen.data = None
         game_data_fen.data_previous = None
-        tree_data_fen.data = {}
+        tree_data_fen.position_data = {}
         tree_data_fen.G_dict = {}
+        tree_data_fen.analyzed_configs = {}
         tree_data_fen.heatmap_data_for_moves = {}
         tree_data_fen.heatmap_data_for_board_states = {}
         return(deleted_row)
 
     if deleted_row is None:
         return (dash.no_update)
-    tree_data_fen.data.pop(deleted_position_id, None) #try to delete corresponding tree data
+    tree_data_fen.position_data.pop(deleted_position_id, None) #try to delete corresponding tree data
     tree_data_fen.G_dict.pop(deleted_position_id, None)
+    tree_data_fen.analyzed_configs.pop(deleted_position_id, None)
     tree_data_fen.heatmap_data_for_moves.pop(deleted_position_id, None)
     tree_data_fen.heatmap_data_for_board_states.pop(deleted_position_id, None)
     game_data_fen.data.pop(deleted_row)
@@ -1,4 +1,4 @@
-from global_data import lc0
+from global_data import lc0, engine_pool, analysis_queue
 from flask import request
 import sys
 from dash.dependencies import Input, Output
@@ -23,7 +23,9 @@ def shutdown():
     func = request.environ.get('werkzeug.server.shutdown')
     if func is None:
         raise RuntimeError('Not running with the Werkzeug Server')
-    print('closing lc0 engine')
+    print('closing lc0 engines')
+    analysis_queue.quit()
+    engine_pool.quit()
     lc0.quit()
     print('Shutting down server')
     func()
@@ -0,0 +1,86 @@
+import base64
+import io
+
+import numpy as np
+
+try:
+    from PIL import Image, ImageColor
+except ImportError: #huge trees are drawn with collapsed subtrees instead of an image
+    Image = None
+
+#server side drawing of huge trees into an image that is shown as a plotly layout image,
+#browser would become unresponsive with hundreds of thousands of points and edges
+#image is indexed, index 0 is the transparent background and the rest are the given colors
+
+RASTER_AVAILABLE = Image is not None
+NODE_RADIUS = 1 #nodes are drawn as squares of 2*NODE_RADIUS + 1 pixels
+
+
+class Raster:
+    def __init__(self, window, width, height, colors):
+        #window: (x0, x1, y0, y1) area of the plot covered by the image, colors: plotly color strings
+        self.window = window
+        self.pixels = np.zeros((height, width), dtype=np.uint8)
+        self.colors = list(colors)
+
+    def to_pixels(self, x, y):
+        x0, x1, y0, y1 = self.window
+        height, width = self.pixels.shape
+        return((x - x0) / (x1 - x0) * width, (y1 - y) / (y1 - y0) * height)
+
+    def set_pixels(self, px, py, color):
+        height, width = self.pixels.shape
+        px = np.clip(px, 0, width - 1).astype(np.int32)
+        py = np.clip(py, 0, height - 1).astype(np.int32)
+        self.pixels.ravel()[py*width + px] = self.colors.index(color) + 1
+
+    def draw_segments(self, x_start, y_start, x_end, y_end, color):
+        px0, py0 = self.to_pixels(x_start, y_start)
+        px1, py1 = self.to_pixels(x_end, y_end)
+        dx, dy = px1 - px0, py1 - py0
+        #clip segments to the image (Liang-Barsky), t0 and t1 are the visible part of each segment
+        height, width = self.pixels.shape
+        t0, t1 = np.zeros(len(dx)), np.ones(len(dx))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for p, q in ((-dx, px0), (dx, width - px0), (-dy, py0), (dy, height - py0)):
+                ratio = q / p
+                t0 = np.where(p < 0, np.maximum(t0, ratio), t0)
+                t1 = np.where(p > 0, np.minimum(t1, ratio), t1)
+                t1 = np.where((p == 0) & (q < 0), -1.0, t1)
+        visible = t0 <= t1
+        px0, py0, dx, dy, t0, t1 = px0[visible], py0[visible], dx[visible], dy[visible], t0[visible], t1[visible]
+        px0, py0, dx, dy = px0 + t0*dx, py0 + t0*dy, (t1 - t0)*dx, (t1 - t0)*dy
+        #one sample per pixel along the longer axis of each segment
+        samples = np.ceil(np.maximum(np.abs(dx), np.abs(dy))).astype(np.int64) + 1
+        segment = np.repeat(np.arange(len(samples), dtype=np.int32), samples)
+        step = (np.arange(len(segment), dtype=np.int32) -
+                np.repeat((np.cumsum(samples) - samples).astype(np.int32), samples)).astype(np.float32)
+        x_step = (dx / np.maximum(samples - 1, 1)).astype(np.float32)
+        y_step = (dy / np.maximum(samples - 1, 1)).astype(np.float32)
+        self.set_pixels(px0.astype(np.float32)[segment] + step*x_step[segment],
+                        py0.astype(np.float32)[segment] + step*y_step[segment], color)
+
+    def draw_points(self, x, y, color):
+        px, py = self.to_pixels(x, y)
+        height, width = self.pixels.shape
+        inside = (px >= 0) & (px < width) & (py >= 0) & (py < height)
+        px, py = px[inside], py[inside]
+        for offset_x in range(-NODE_RADIUS, NODE_RADIUS + 1):
+            for offset_y in range(-NODE_RADIUS, NODE_RADIUS + 1):
+                self.set_pixels(px + offset_x, py + offset_y, color)
+
+    def to_image_source(self):
+        #png data url
+        image = Image.fromarray(self.pixels, 'P')
+        palette = [255, 255, 255] + [channel for color in self.colors for channel in ImageColor.getrgb(color)[:3]]
+        image.putpalette(palette)
+        buffer = io.BytesIO()
+        image.save(buffer, format='PNG', transparency=0)
+        return('data:image/png;base64,' + base64.b64encode(buffer.getvalue()).decode('ascii'))
+
+    def to_layout_image(self):
+        #image placed under the traces of the tree plot, stretched over its window
+        x0, x1, y0, y1 = self.window
+        return({'source': self.to_image_source(), 'xref': 'x', 'yref': 'y', 'x': x0, 'y': y1,
+                'sizex': x1 - x0, 'sizey': y1 - y0, 'xanchor': 'left', 'yanchor': 'top',
+                'sizing': 'stretch', 'layer': 'below'})
@@ -0,0 +1,80 @@
+#compares gml_reader.read_tree_gml against networkx read_gml on synthetic lc0_tree dumps
+#usage: python benchmark_gml_reader.py [--sizes 10000 100000 1000000] [--networkx-max 100000]
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+import networkx as nx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from gml_reader import read_tree_gml
+
+FILES = 'abcdefgh'
+RANKS = '12345678'
+
+
+def random_move(rnd):
+    return(rnd.choice(FILES) + rnd.choice(RANKS) + rnd.choice(FILES) + rnd.choice(RANKS))
+
+
+def write_synthetic_tree(path, nr_of_nodes, seed=0):
+    #random tree with lc0_tree style attributes, nodes written in depth first order like lc0_tree does
+    rnd = random.Random(seed)
+    children = [[] for _ in range(nr_of_nodes)]
+    for node in range(1, nr_of_nodes):
+        #attach preferably to recent nodes to get deep, lc0 like trees
+        parent = rnd.randint(max(0, node - 50), node - 1)
+        children[parent].append(node)
+    with open(path, 'w') as f:
+        f.write('graph [\n  directed 1\n')
+        stack = [0]
+        while stack:
+            node = stack.pop()
+            move = '' if node == 0 else random_move(rnd)
+            f.write(f'  node [\n    id {node}\n    N "{rnd.randint(1, nr_of_nodes)}"\n'
+                    f'    Q "{rnd.uniform(-1, 1):.5f}"\n    D "{rnd.uniform(0, 1):.5f}"\n'
+                    f'    M "{rnd.uniform(0, 150):.3f}"\n    P "{rnd.uniform(0, 1):.4f}"\n'
+                    f'    move "{move}"\n  ]\n')
+            stack.extend(reversed(children[node]))
+        for parent, node_children in enumerate(children):
+            for child in node_children:
+                f.write(f'  edge [\n    source {parent}\n    target {child}\n  ]\n')
+        f.write(']\n')
+
+
+def timed(function, *args, **kwargs):
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return(time.perf_counter() - start, result)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--networkx-max', type=int, default=100000,
+                        help='skip networkx read_gml for larger trees as it takes minutes')
+    args = parser.parse_args()
+
+    print(f'{"nodes":>10} {"file MB":>8} {"read_gml s":>11} {"read_tree_gml s":>16} {"speedup":>8}')
+    with tempfile.TemporaryDirectory(prefix='lct_benchmark_') as directory:
+        for size in args.sizes:
+            path = os.path.join(directory, f'tree_{size}.gml')
+            write_synthetic_tree(path, size)
+            file_size = os.path.getsize(path) / 2**20
+
+            fast_time, columns = timed(read_tree_gml, path)
+            assert len(columns['id']) == size
+            if size <= args.networkx_max:
+                nx_time, G = timed(nx.readwrite.gml.read_gml, path, label='id')
+                assert G.number_of_nodes() == size
+                print(f'{size:>10} {file_size:>8.1f} {nx_time:>11.2f} {fast_time:>16.2f} {nx_time / fast_time:>7.1f}x')
+            else:
+                print(f'{size:>10} {file_size:>8.1f} {"-":>11} {fast_time:>16.2f} {"-":>8}')
+            os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+#compares buchheim.buchheim_layout against the recursive DrawTree implementation on synthetic search trees
+#and checks that both give the same coordinates
+#usage: python benchmark_layout.py [--sizes 1000 10000 100000 1000000] [--drawtree-max 100000]
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from buchheim import buchheim, buchheim_layout
+from searchtree import SearchTree, SQUARES
+
+
+def synthetic_tree(nr_of_nodes, seed=0):
+    #random lc0 like tree: deep, with visits of each node equal to its subtree size
+    rnd = random.Random(seed)
+    parent = [-1] + [rnd.randint(max(0, node - 50), node - 1) for node in range(1, nr_of_nodes)]
+    N = [1] * nr_of_nodes
+    for node in range(nr_of_nodes - 1, 0, -1):
+        N[parent[node]] += N[node]
+    moves = [''] + [rnd.choice(SQUARES) + rnd.choice(SQUARES) for _ in range(1, nr_of_nodes)]
+    nan = np.full(nr_of_nodes, np.nan)
+    columns = {'parent': np.array(parent), 'move': moves, 'N': np.array(N),
+               'Q': nan, 'P': nan, 'D': nan, 'M': nan}
+    return(SearchTree.from_columns(columns))
+
+
+def drawtree_layout(G):
+    #coordinates from the recursive implementation, arranged like buchheim_layout output
+    tree = buchheim(G, G.root)
+    x = np.empty(len(G))
+    depth = np.empty(len(G), dtype=np.int64)
+    stack = [tree]
+    while stack:
+        t = stack.pop()
+        x[t.node] = t.x
+        depth[t.node] = t.y
+        stack.extend(t.children)
+    return(x, depth)
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return(time.perf_counter() - start, result)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000, 1000000])
+    parser.add_argument('--drawtree-max', type=int, default=100000,
+                        help='skip the recursive implementation for larger trees')
+    args = parser.parse_args()
+    sys.setrecursionlimit(100000)
+
+    print(f'{"nodes":>10} {"depth":>6} {"DrawTree s":>11} {"buchheim_layout s":>18} {"speedup":>8}')
+    for size in args.sizes:
+        G = synthetic_tree(size)
+        fast_time, (x, depth) = timed(buchheim_layout, G)
+        if size <= args.drawtree_max:
+            old_time, (old_x, old_depth) = timed(drawtree_layout, G)
+            assert np.array_equal(x, old_x) and np.array_equal(depth, old_depth), 'layouts differ'
+            print(f'{size:>10} {depth.max():>6} {old_time:>11.2f} {fast_time:>18.2f} {old_time / fast_time:>7.1f}x')
+        else:
+            print(f'{size:>10} {depth.max():>6} {"-":>11} {fast_time:>18.2f} {"-":>8}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+#measures the server side of showing a tree figure: size of the figure json that update_data sends to the browser,
+#bytes transferred and time from sending the request until the response is decoded
+#drawing the figure in the browser is not included, plotly.js rendering time has to be measured in the browser
+#default mode builds synthetic trees of given sizes, installs them as analyzed start position and requests
+#the figure through the app's flask test client, once with plain and once with compact payload encoding
+#with --url the figure of an already analyzed position is requested from a running LcT instead
+#usage: python measure_figure_request.py [--sizes 1000 10000 100000] [--url http://localhost:8050 --row 0 --config 0]
+import argparse
+import gzip
+import json
+import os
+import sys
+import time
+import urllib.request
+
+import numpy as np
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+START_FEN = 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1'
+
+
+def update_data_request(row, config, position_mode):
+    #body of the dash request that triggers graph.update_data
+    outputs = [{'id': 'graph', 'property': 'figure'}, {'id': 'config_info', 'property': 'children'},
+               {'id': 'graph-viewport', 'property': 'data'}]
+    return({'output': '..graph.figure...config_info.children...graph-viewport.data..',
+            'outputs': outputs,
+            'inputs': [{'id': 'slider1', 'property': 'value', 'value': config},
+                       {'id': 'move-table', 'property': 'active_cell', 'value': {'row': row, 'column': 0}},
+                       {'id': 'net-mode-selector', 'property': 'value', 'value': []},
+                       {'id': 'config-table-dummy-div', 'property': 'children', 'value': None},
+                       {'id': 'graph', 'property': 'relayoutData', 'value': None},
+                       {'id': 'growth-mode-selector', 'property': 'value', 'value': []}],
+            'state': [{'id': 'net_selector', 'property': 'value', 'value': None},
+                      {'id': 'position-mode-selector', 'property': 'value', 'value': position_mode},
+                      {'id': 'graph-viewport', 'property': 'data', 'value': None}],
+            'changedPropIds': ['slider1.value']})
+
+
+def measure(post, body):
+    #returns (seconds, bytes transferred, bytes of json, number of plotted nodes)
+    #time covers the request and decoding the response, not drawing the figure in the browser
+    start = time.perf_counter()
+    content, encoding = post(json.dumps(body).encode())
+    raw = gzip.decompress(content) if encoding == 'gzip' else content
+    figure = json.loads(raw)['response']['graph']['figure']
+    elapsed = time.perf_counter() - start
+    nodes = sum(len(trace.get('customdata') or []) for trace in figure['data'])
+    return(elapsed, len(content), len(raw), nodes)
+
+
+def test_client_post(client):
+    def post(data):
+        response = client.post('/_dash-update-component', data=data, content_type='application/json',
+                               headers={'Accept-Encoding': 'gzip'})
+        return(response.data, response.headers.get('Content-Encoding'))
+    return(post)
+
+
+def url_post(url):
+    def post(data):
+        request = urllib.request.Request(url.rstrip('/') + '/_dash-update-component', data=data,
+                                         headers={'Content-Type': 'application/json', 'Accept-Encoding': 'gzip'})
+        with urllib.request.urlopen(request) as response:
+            return(response.read(), response.headers.get('Content-Encoding'))
+    return(post)
+
+
+def report(label, result):
+    elapsed, transferred, size, nodes = result
+    print(f'{label:>20} {nodes:>8} {size / 1e6:>10.2f} {transferred / 1e6:>14.2f} {elapsed * 1000:>10.0f}')
+
+
+def synthetic_position(nr_of_nodes, seed):
+    #synthetic tree with random metrics, as the engine would report them
+    from benchmark_layout import synthetic_tree
+    tree = synthetic_tree(nr_of_nodes, seed)
+    rnd = np.random.RandomState(seed)
+    tree.Q = np.round(rnd.uniform(-1, 1, nr_of_nodes), 5)
+    tree.P = np.round(rnd.uniform(0, 1, nr_of_nodes), 4)
+    tree.D = np.round(rnd.uniform(0, 1, nr_of_nodes), 5)
+    tree.M = np.round(rnd.uniform(0, 150, nr_of_nodes), 3)
+    return(tree)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--url', help='measure a running LcT instead of synthetic trees')
+    parser.add_argument('--row', type=int, default=0, help='position row with --url')
+    parser.add_argument('--config', type=int, default=0, help='config index with --url')
+    parser.add_argument('--position-mode', default='fen', choices=['fen', 'pgn'])
+    args = parser.parse_args()
+
+    print(f'{"":>20} {"nodes":>8} {"json MB":>10} {"transferred MB":>14} {"request ms":>10}')
+    if args.url:
+        body = update_data_request(args.row, args.config, args.position_mode)
+        report('running app', measure(url_post(args.url), body))
+        return
+
+    os.chdir(ROOT_DIR)
+    import app #builds layout and registers callbacks
+    import graph
+    import global_data as gd
+    from position_data import build_position_data
+
+    gd.game_data_fen.add_fen(START_FEN)
+    client = test_client_post(app.app.server.test_client())
+    body = update_data_request(0, 0, 'fen')
+    position_id = gd.game_data_fen.data[0]['ply']
+    for size in args.sizes:
+        tree = synthetic_position(size, seed=size)
+        gd.tree_data_fen.install_position_data(position_id, build_position_data([tree], START_FEN))
+        for label, limit in (('plain', float('inf')), ('compact', 0)):
+            graph.NODE_LIMIT_FOR_COMPACT_PAYLOAD = limit
+            gd.figure_cache.invalidate('fen')
+            report(f'{label} {size}', measure(client, body))
+    print('responses are gzip compressed' if app.app.server.config.get('COMPRESS_MIMETYPES') else
+          'responses are not compressed, flask_compress is not installed')
+    gd.engine_pool.quit()
+    gd.lc0.quit()
+
+
+if __name__ == '__main__':
+    main()
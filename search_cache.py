@@ -0,0 +1,118 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from os.path import join, isfile
+
+import numpy as np
+
+from searchtree import SearchTree
+
+#persistent cache of search trees, content addressed by everything that determines the search result:
+#position (start fen and moves, as lc0 uses history), normalized uci options, node limit (and limits of the
+#earlier searches of a budget ladder) and hashes of the weights file and of the engine binary
+#entries are evicted in least recently used order when the cache grows over its size limit
+
+CACHE_FILE_EXTENSION = '.npz'
+
+
+_file_hashes = {} #{(path, size, mtime): sha256}
+_file_hashes_lock = threading.Lock()
+
+
+def file_hash(path):
+    #sha256 of file content, memoized so that large weight files are hashed only once
+    stat = os.stat(path)
+    memo_key = (os.path.abspath(path), stat.st_size, stat.st_mtime)
+    with _file_hashes_lock:
+        digest = _file_hashes.get(memo_key)
+    if digest is None:
+        sha = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(2**20), b''):
+                sha.update(chunk)
+        digest = sha.hexdigest()
+        with _file_hashes_lock:
+            _file_hashes[memo_key] = digest
+    return(digest)
+
+
+class SearchCache:
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        #size of each cached file, kept in memory so that eviction doesn't need to stat every entry
+        self.sizes = {}
+        for f in os.listdir(directory):
+            if f.endswith(CACHE_FILE_EXTENSION):
+                self.sizes[f] = os.path.getsize(join(directory, f))
+
+    def get_key(self, board, options, nodes, weights_path, engine_path, previous_budgets=()):
+        #options must be normalized the same way as they are sent to the engine
+        #previous_budgets: node limits searched before in the same game when the tree comes from a budget ladder
+        #returns None when the weights or the engine binary can't be hashed, such searches are not cached
+        options = dict(options)
+        #weights the engine was launched with are used when WeightsFile is not set, other values such as
+        #<autodiscover> don't tell which weights the engine loads
+        weights_path = options.pop('WeightsFile', None) or weights_path
+        if not all(isinstance(path, str) and isfile(path) for path in (weights_path, engine_path)):
+            return(None)
+        content = {'fen': board.root().fen(),
+                   'moves': [move.uci() for move in board.move_stack],
+                   'options': {opt: str(value) for opt, value in sorted(options.items())},
+                   'nodes': int(nodes),
+                   'weights': file_hash(weights_path),
+                   'engine': file_hash(engine_path)}
+        if previous_budgets:
+            content['previous_budgets'] = [int(budget) for budget in previous_budgets]
+        return(hashlib.sha256(json.dumps(content, sort_keys=True).encode()).hexdigest())
+
+    def get_path(self, key):
+        return(join(self.directory, key + CACHE_FILE_EXTENSION))
+
+    def load(self, key):
+        path = self.get_path(key)
+        try:
+            with np.load(path, allow_pickle=False) as arrays:
+                tree = SearchTree.from_arrays(arrays)
+        except (OSError, ValueError, KeyError):
+            #not cached or unreadable entry
+            return(None)
+        #file modification time tracks last use for lru eviction
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return(tree)
+
+    def store(self, key, tree):
+        path = self.get_path(key)
+        #write to temporary file first so that other LcT instances never see partially written entries
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            np.savez(f, **tree.to_arrays())
+        os.replace(tmp_path, path)
+        with self.lock:
+            self.sizes[os.path.basename(path)] = os.path.getsize(path)
+            self.evict()
+
+    def evict(self):
+        total = sum(self.sizes.values())
+        if total <= self.max_bytes:
+            return
+        def last_used(f):
+            try:
+                return(os.path.getmtime(join(self.directory, f)))
+            except OSError:
+                return(0)
+        for f in sorted(self.sizes, key=last_used):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(join(self.directory, f))
+            except OSError:
+                pass
+            total -= self.sizes.pop(f)
@@ -0,0 +1,180 @@
+import threading
+import numpy as np
+import networkx as nx
+
+SQUARES = [f + r for r in '12345678' for f in 'abcdefgh']
+
+#every uci move string gets a fixed int16 code, '' is the code of root's (missing) move
+#the table is built identically in every process so codes can be shared between processes
+MOVE_TABLE = [''] + [a + b for a in SQUARES for b in SQUARES if a != b] + \
+             [a + b + p for a in SQUARES for b in SQUARES
+              if a[1] + b[1] in ('78', '21') and abs(ord(a[0]) - ord(b[0])) <= 1 for p in 'qrbn']
+MOVE_CODES = {move: code for code, move in enumerate(MOVE_TABLE)}
+_move_table_lock = threading.Lock()
+
+METRIC_COLUMNS = ('N', 'Q', 'P', 'D', 'M')
+
+ROOT = 0
+
+
+def intern_moves(moves):
+    codes = np.empty(len(moves), dtype=np.int16)
+    for i, move in enumerate(moves):
+        code = MOVE_CODES.get(move)
+        if code is None: #non-standard move string, e.g. a1a1 null move
+            with _move_table_lock:
+                code = MOVE_CODES.setdefault(move, len(MOVE_TABLE))
+                if code == len(MOVE_TABLE):
+                    MOVE_TABLE.append(move)
+        codes[i] = code
+    return(codes)
+
+
+def breadth_first_order(parent):
+    #returns row indices in breadth first order, children keep their relative order
+    n = len(parent)
+    is_child = parent >= 0
+    by_parent = np.flatnonzero(is_child)[np.argsort(parent[is_child], kind='stable')]
+    counts = np.bincount(parent[is_child], minlength=n)
+    offsets = np.concatenate(([0], np.cumsum(counts)))
+
+    order = [np.flatnonzero(~is_child)[:1]]
+    frontier = order[0]
+    while len(frontier):
+        sizes = counts[frontier]
+        total = sizes.sum()
+        if total == 0:
+            break
+        #indices of children blocks of the whole frontier, gathered without a python loop
+        block_starts = np.repeat(offsets[frontier] - np.cumsum(sizes) + sizes, sizes)
+        frontier = by_parent[block_starts + np.arange(total)]
+        order.append(frontier)
+    return(np.concatenate(order))
+
+
+def child_offsets_from_parent(parent):
+    #parent array must be in breadth first order
+    child_counts = np.bincount(parent[1:], minlength=len(parent))
+    return(np.concatenate(([1], 1 + np.cumsum(child_counts))).astype(np.int32))
+
+
+class SearchTree:
+    #compact array representation of lc0 search tree
+    #nodes are rows 0..n-1 in breadth first order with root at row 0, so that
+    #children of node i are the consecutive rows child_offsets[i]:child_offsets[i+1]
+    #Q, P, D and M are None for trees that are not engine dumps, e.g. merged trees
+    def __init__(self, parent, child_offsets, move_codes, N, Q=None, P=None, D=None, M=None):
+        self.parent = parent
+        self.child_offsets = child_offsets
+        self.move_codes = move_codes
+        self.N = N
+        self.Q = Q
+        self.P = P
+        self.D = D
+        self.M = M
+        self.root = ROOT
+        #depth of each node and its branch, i.e. ancestor on depth 1 (root is its own branch)
+        #rows of each depth are consecutive so one pass over the depths is enough
+        self.depth = np.zeros(len(parent), dtype=np.int32)
+        self.branch = np.arange(len(parent), dtype=np.int32)
+        for depth, (start, end) in enumerate(self.levels()):
+            self.depth[start:end] = depth
+            if depth > 1:
+                self.branch[start:end] = self.branch[parent[start:end]]
+
+    @classmethod
+    def from_columns(cls, columns):
+        #columns as returned by gml_reader.read_tree_gml
+        order = breadth_first_order(columns['parent'])
+        rank = np.empty(len(order), dtype=np.int64)
+        rank[order] = np.arange(len(order))
+
+        old_parent = columns['parent'][order]
+        parent = np.where(old_parent >= 0, rank[np.maximum(old_parent, 0)], -1).astype(np.int32)
+        child_offsets = child_offsets_from_parent(parent)
+        moves = columns['move']
+        move_codes = intern_moves([moves[i] for i in order])
+        metrics = {key: columns[key][order] for key in METRIC_COLUMNS}
+        return(cls(parent, child_offsets, move_codes, **metrics))
+
+    def to_arrays(self):
+        #plain arrays for storing the tree, moves are stored as strings
+        #since codes of non-standard moves are only valid within one process
+        codes, move_index = np.unique(self.move_codes, return_inverse=True)
+        arrays = {'parent': self.parent,
+                  'child_offsets': self.child_offsets,
+                  'move_index': move_index.astype(np.int16),
+                  'moves': np.array([MOVE_TABLE[code] for code in codes])}
+        arrays.update({key: getattr(self, key) for key in METRIC_COLUMNS})
+        return(arrays)
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        move_codes = intern_moves(arrays['moves'].tolist())[arrays['move_index']]
+        metrics = {key: arrays[key] for key in METRIC_COLUMNS}
+        return(cls(arrays['parent'], arrays['child_offsets'], move_codes, **metrics))
+
+    def __reduce__(self):
+        #pickle with move strings like to_arrays, so that trees can be sent to other processes
+        return(SearchTree.from_arrays, (self.to_arrays(),))
+
+    def __len__(self):
+        return(len(self.parent))
+
+    def __iter__(self):
+        return(iter(range(len(self.parent))))
+
+    def __contains__(self, n):
+        return(0 <= n < len(self.parent))
+
+    def number_of_nodes(self):
+        return(len(self.parent))
+
+    def get_children(self, n):
+        return(range(self.child_offsets[n], self.child_offsets[n + 1]))
+
+    def get_parent(self, n):
+        parent = self.parent[n]
+        return(None if parent < 0 else int(parent))
+
+    def out_degree(self, n):
+        return(int(self.child_offsets[n + 1] - self.child_offsets[n]))
+
+    def out_edges(self, n):
+        return([(n, child) for child in self.get_children(n)])
+
+    def number_of_edges(self):
+        return(len(self.parent) - 1)
+
+    def get_depth_counts(self):
+        #number of nodes on each depth, starting from root
+        return(np.bincount(self.depth))
+
+    def levels(self):
+        #(start, end) row ranges of each depth, children of rows start:end are rows end:child_offsets[end]
+        start, end = 0, 1
+        while start < end:
+            yield(start, end)
+            start, end = end, int(self.child_offsets[end])
+
+    def get_move(self, n):
+        return(MOVE_TABLE[self.move_codes[n]])
+
+    def get_attributes(self, n):
+        #node attributes like networkx node data, attributes missing from the engine dump are left out
+        attributes = {'move': self.get_move(n), 'N': int(self.N[n])}
+        for key in ('Q', 'P', 'D', 'M'):
+            column = getattr(self, key)
+            if column is None:
+                continue
+            value = float(column[n])
+            if value == value:
+                attributes[key] = value
+        return(attributes)
+
+    def to_digraph(self):
+        #networkx version of the tree with row indices as node names
+        G = nx.DiGraph()
+        G.add_nodes_from((n, self.get_attributes(n)) for n in self)
+        G.add_edges_from((int(p), n) for n, p in enumerate(self.parent.tolist()) if p >= 0)
+        return(G)
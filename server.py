@@ -2,6 +2,11 @@ import dash
 from os.path import join
 from constants import ROOT_DIR
 
-app = dash.Dash(__name__, assets_folder=join(ROOT_DIR, 'assets'))
+try:
+    import flask_compress
+except ImportError: #responses are sent uncompressed
+    flask_compress = None
+
+app = dash.Dash(__name__, assets_folder=join(ROOT_DIR, 'assets'), compress=flask_compress is not None)
 app.config['suppress_callback_exceptions'] = True
 app.title = 'LcT'
\ No newline at end of file
@@ -8,6 +8,7 @@ from constants import ROOT_DIR
 build_exe_options = {
     "packages": ["dash", "plotly",
                  "networkx",
+                 "numpy",
                  "jinja2",
                  ],
     #"includes": [],
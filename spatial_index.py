@@ -0,0 +1,45 @@
+import numpy as np
+
+#uniform grid over the node coordinates of a tree layout, for finding the nodes inside a rectangle
+#(such as the zoomed viewport of the tree plot) without scanning all nodes
+#nodes are sorted by grid cell, cells are numbered row by row, so the cells of one row inside
+#the rectangle are a contiguous slice of the sorted nodes
+
+NODES_PER_CELL = 64 #average number of nodes in a grid cell
+
+
+class GridIndex:
+    def __init__(self, x, y, nodes_per_cell=NODES_PER_CELL):
+        #x, y: node coordinates, y may have a different scale than x
+        self.x = x
+        self.y = y
+        self.size = max(int(np.sqrt(len(x) / nodes_per_cell)), 1) #number of rows and columns
+        if len(x) == 0:
+            self.x_min, self.y_min, self.cell_width, self.cell_height = 0.0, 0.0, 1.0, 1.0
+        else:
+            self.x_min, self.y_min = float(x.min()), float(y.min())
+            self.cell_width = (float(x.max()) - self.x_min) / self.size or 1.0
+            self.cell_height = (float(y.max()) - self.y_min) / self.size or 1.0
+        cells = self.get_rows(y) * self.size + self.get_columns(x)
+        self.order = np.argsort(cells, kind='stable').astype(np.int32)
+        self.cell_starts = np.searchsorted(cells[self.order], np.arange(self.size * self.size + 1))
+
+    def get_columns(self, x):
+        return(np.clip(np.floor((np.asarray(x, dtype=np.float64) - self.x_min) / self.cell_width),
+                       0, self.size - 1).astype(np.int64))
+
+    def get_rows(self, y):
+        return(np.clip(np.floor((np.asarray(y, dtype=np.float64) - self.y_min) / self.cell_height),
+                       0, self.size - 1).astype(np.int64))
+
+    def query(self, x0, x1, y0, y1):
+        #sorted ids of nodes with x0 <= x <= x1 and y0 <= y <= y1, bounds may be infinite
+        first_column, last_column = self.get_columns([x0, x1])
+        rows = np.arange(self.get_rows(y0), self.get_rows(y1) + 1)
+        starts = self.cell_starts[rows * self.size + first_column]
+        ends = self.cell_starts[rows * self.size + last_column + 1]
+        candidates = np.concatenate([self.order[start:end] for start, end in zip(starts, ends)] +
+                                    [np.zeros(0, dtype=np.int32)])
+        x, y = self.x[candidates], self.y[candidates]
+        candidates = candidates[(x >= x0) & (x <= x1) & (y >= y0) & (y <= y1)]
+        return(np.sort(candidates))